@@ -0,0 +1,157 @@
+'''
+Batch solver: solves many boards across a process pool and streams one JSON line per board as soon as it is solved.
+
+Boards are read one per line from a file or stdin, tiles in row order separated by spaces or commas with 0 for the blank:
+    $python batch.py boards.txt --algorithm ida --processes 8 --time-limit 60 > results.jsonl
+    $cat boards.txt | python batch.py - --pdb 6-6-3
+    $python batch.py boards.txt --heuristic max:linear_conflict,walking_distance
+    $python batch.py boards.txt --cache solutions.db
+    $python batch.py boards_3x5.txt --shape 3x5
+
+Each result line holds the board's line number, status ("solved", "unsolvable", "timeout" or "failed"), lower bounds on
+the solution length, the moves as a string of the directions the blank moves ("DURL", see games.string_to_moves, or
+[row, col] pairs with --pairs), the solution length, the nodes expanded and the solve time in seconds. The anytime solvers
+(e.g. --algorithm anytime-astar) also report a proven bound on the solution length over the optimal length as "suboptimality".
+With --cache the optimal solutions are stored in an sqlite database shared by the workers and later runs, and boards (or
+their mirror images) found there are answered without searching, marked "cached": true.
+Results arrive in completion order, not input order.
+
+With --estimate the boards are only checked for solvability and given their lower bounds, without solving, so a
+scheduler can estimate the cost of a batch before dispatching it.
+'''
+
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import sys
+
+#local imports
+import heuristics
+from games import State, moves_to_string, parse_size
+from solution_cache import SolutionCache
+from tree_search import TreeSearch, SOLVERS, ANYTIME_SOLVERS, TIME_LIMIT
+
+# Per process solver settings, set up once by the pool initializer (or by solver.py for its single worker)
+_worker = {}
+
+
+def parse_board(line, size=None):
+    # size: (rows, cols) or an integer, None for a square board of the line's length
+    tiles = [int(tile) for tile in line.replace(",", " ").split()]
+    rows, cols = heuristics.dimensions(size if size is not None else math.isqrt(len(tiles)))
+    if rows < 2 or cols < 2 or rows * cols != len(tiles) or sorted(tiles) != list(range(rows * cols)):
+        raise ValueError("Not a valid board: %r" % line.strip())
+    return [tiles[row * cols:(row + 1) * cols] for row in range(rows)]
+
+
+def init_worker(algorithm, time_limit, heuristic, estimate_only=False, cache=None, size=None, pairs=False):
+    _worker["algorithm"] = SOLVERS.get(algorithm) or ANYTIME_SOLVERS[algorithm]
+    _worker["pairs"] = pairs
+    _worker["size"] = size
+    _worker["estimate_only"] = estimate_only
+    _worker["time_limit"] = time_limit
+    _worker["heuristic"] = heuristic
+    _worker["heuristics"] = {} # heuristic tables and pattern databases are built once per size and reused for every board
+    _worker["cache"] = SolutionCache(cache) if cache is not None else None
+
+
+def load_heuristic(size):
+    if _worker["heuristic"] is None:
+        return None
+    if size not in _worker["heuristics"]:
+        _worker["heuristics"][size] = heuristics.get_heuristic(_worker["heuristic"], size)
+    return _worker["heuristics"][size]
+
+
+def solve_board(task):
+    number, line = task
+    result = {"id": number, "board": line.strip()}
+    try:
+        grid = parse_board(line, _worker["size"])
+    except ValueError as e:
+        result.update(status="failed", error=str(e))
+        return result
+
+    # one board's failure (e.g. a pattern database missing for its size) is reported in its result instead of stopping the batch
+    try:
+        solve_grid(grid, result)
+    except Exception as e:
+        result.update(status="failed", error="%s: %s" % (type(e).__name__, e))
+    return result
+
+
+def solve_grid(grid, result):
+    # Solves a parsed board, filling in result
+    state = State((len(grid), len(grid[0])), grid)
+    result["lower_bounds"] = state.lower_bounds()
+    if _worker["estimate_only"]:
+        result["status"] = "solvable" if state.is_solvable() else "unsolvable"
+        return
+
+    ts = TreeSearch(state, heuristic=load_heuristic(state.size), time_limit=_worker["time_limit"],
+                    cache=_worker["cache"])
+    # solvers report problems on stdout, which carries the results here
+    with contextlib.redirect_stdout(sys.stderr):
+        sequence = getattr(ts, _worker["algorithm"])()
+
+    if ts.status == "UNSOLVABLE":
+        status = "unsolvable"
+    elif ts.timer is None:
+        status = "timeout"
+    elif sequence or state.goal_test():
+        status = "solved"
+    else:
+        status = "failed"
+    result.update(status=status, moves=[list(move) for move in sequence] if _worker["pairs"] else moves_to_string(sequence), length=len(sequence),
+                  nodes=ts.visit_counter, time=ts.timer)
+    if ts.suboptimality is not None:
+        result["suboptimality"] = ts.suboptimality
+    if ts.cache_hit:
+        result["cached"] = True
+
+
+def solve_batch(lines, algorithm="ida", processes=None, time_limit=TIME_LIMIT, heuristic=None, estimate_only=False, cache=None,
+                size=None, pairs=False):
+    '''
+    Solves every board in lines on a process pool, yielding result dictionaries as each board finishes.
+    Blank lines and lines starting with # are skipped; ids are the 1-based line numbers.
+    heuristic is a name from the heuristics registry (e.g. "linear_conflict" or "pdb:6-6-3"), None for Manhattan distance.
+    cache is the path of a solution_cache database, None to solve every board from scratch.
+    size is (rows, cols) for rectangular boards, None for square boards of any size.
+    pairs reports the moves as [row, col] pairs instead of a move string.
+    '''
+    tasks = ((number, line) for number, line in enumerate(lines, 1) if line.strip() and not line.startswith("#"))
+    initargs = (algorithm, time_limit, heuristic, estimate_only, cache, size, pairs)
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=initargs) as pool:
+        for result in pool.imap_unordered(solve_board, tasks):
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve sliding tile boards in parallel, one JSON result per line.")
+    parser.add_argument("input", nargs="?", default="-", help="file with one board per line, - for stdin")
+    parser.add_argument("--algorithm", choices=sorted(SOLVERS) + sorted(ANYTIME_SOLVERS), default="ida",
+                        help="anytime solvers return their best solution at the time limit, possibly longer than optimal")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT, help="seconds allowed per board")
+    parser.add_argument("--heuristic", default=None, metavar="NAME",
+                        help="heuristic by name: %s, max:a,b, sum:a,b or pdb:PARTITION" % ", ".join(sorted(heuristics.HEURISTICS)))
+    parser.add_argument("--pdb", default=None, metavar="PARTITION", help="use an additive pattern database, e.g. 6-6-3 (same as --heuristic pdb:6-6-3)")
+    parser.add_argument("--estimate", action="store_true", help="only check solvability and report lower bounds")
+    parser.add_argument("--cache", default=None, metavar="PATH", help="sqlite database of solutions to reuse and extend")
+    parser.add_argument("--shape", type=parse_size, default=None, metavar="ROWSxCOLS", help="board shape, e.g. 3x5 (default: square)")
+    parser.add_argument("--pairs", action="store_true", help="report the moves as [row, col] pairs instead of a DURL string")
+    args = parser.parse_args(argv)
+    heuristic = "pdb:" + args.pdb if args.pdb else args.heuristic
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    with source:
+        for result in solve_batch(source, args.algorithm, args.processes, args.time_limit, heuristic, args.estimate, args.cache,
+                                  args.shape, args.pairs):
+            print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+'''
+Headless benchmark suite for the TreeSearch solvers, no pygame, matplotlib or display needed.
+
+Every solver runs on fixed instance sets stored in instances/ (generated once from a seed, with their optimal solution
+lengths), and the results (solved, nodes expanded, nodes per second, peak memory, optimality) can be compared against a
+saved baseline to catch performance regressions (solutions longer than optimal only count as one for the optimal solvers,
+the anytime solvers report their average suboptimality instead):
+    $python benchmark.py --save-baseline bench_baseline.json
+    $python benchmark.py --baseline bench_baseline.json --threshold 0.2
+
+The instance files can be regenerated from their seeds with --generate. Korf's 100 15-puzzle instances are shipped in
+instances/korf100.txt, converted from his table (one instance per line: its number, the 16 tiles with 0 for the blank in
+Korf's blank-first goal convention, then optionally the optimal length) with:
+    $python benchmark.py --import-korf korf_table.txt
+They are solved with the 6-6-3 pattern database, built into pdb/ on the first run, and take hours, so they only run
+when asked for:
+    $python benchmark.py --sets korf100
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+#local imports
+import heuristics
+from games import State
+from scramble import random_board, random_walk
+from tree_search import TreeSearch, TranspositionTable, SOLVERS, ANYTIME_SOLVERS
+
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instances")
+
+# Stored instance sets: how they were generated and which solvers run on them by default. Optional keys: the heuristic
+# they use by name if not Manhattan distance, their own time limit per instance (seconds, --time-limit overrides it),
+# "memory": False to skip the traced runs and "default": False to only run the set when named with --sets
+INSTANCE_SETS = {
+    "3x3_random": {"size": 3, "kind": "random", "count": 25, "seed": 0,
+                   "algorithms": ["bfs", "bfs-bidirectional", "bfs-batch", "astar", "astar-compact", "astar-buckets", "astar-bidirectional", "ida"]},
+    "4x4_walk40": {"size": 4, "kind": "walk", "depth": 40, "count": 20, "seed": 1,
+                   "algorithms": ["astar", "astar-compact", "astar-buckets", "astar-bidirectional", "ida"]},
+    # hours on one core (up to several minutes per instance, and the pattern database is built on the first run)
+    "korf100": {"size": 4, "kind": "imported", "heuristic": "pdb:6-6-3", "time_limit": 1800, "memory": False, "default": False,
+                "algorithms": ["ida"]},
+}
+
+
+def load_instances(name):
+    # Returns a list of (tiles, optimal length or None)
+    instances = []
+    with open(os.path.join(INSTANCE_DIR, name + ".txt")) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            board, _, optimal = line.partition("|")
+            instances.append(([int(tile) for tile in board.split()], int(optimal) if optimal.strip() else None))
+    return instances
+
+
+def save_instances(name, header, instances):
+    os.makedirs(INSTANCE_DIR, exist_ok=True)
+    with open(os.path.join(INSTANCE_DIR, name + ".txt"), "w") as f:
+        f.write("# %s\n# tiles in row order (0 is the blank) | optimal solution length\n" % header)
+        for tiles, optimal in instances:
+            f.write("%s | %s\n" % (" ".join(str(tile) for tile in tiles), "" if optimal is None else optimal))
+
+
+def grid_of(tiles):
+    size = int(len(tiles) ** 0.5)
+    return [tiles[row * size:(row + 1) * size] for row in range(size)]
+
+
+def generate(name):
+    spec = INSTANCE_SETS[name]
+    rng = random.Random(spec["seed"])
+    instances = []
+    for _ in range(spec["count"]):
+        if spec["kind"] == "random":
+            tiles = random_board(spec["size"], rng)
+        else:
+            tiles = random_walk(spec["size"], spec["depth"], rng)
+        ts = TreeSearch(State(spec["size"], grid_of(tiles)))
+        instances.append((tiles, len(ts.IDA_star_inplace_solve())))
+    if spec["kind"] == "random":
+        header = "%dx%d uniformly random solvable boards, seed %d" % (spec["size"], spec["size"], spec["seed"])
+    else:
+        header = "%dx%d random walks of %d moves without undos, seed %d" % (spec["size"], spec["size"], spec["depth"], spec["seed"])
+    save_instances(name, header, instances)
+    return instances
+
+
+def import_korf(path):
+    # Korf's goal has the blank first, ours has it last: turning the board half a turn and renaming tile t to 16 - t
+    # maps one goal onto the other without changing solution lengths
+    instances = []
+    with open(path) as f:
+        for line in f:
+            fields = [int(field) for field in line.split()]
+            if len(fields) < 16:
+                continue
+            if len(fields) > 16:
+                fields = fields[1:] # instance number
+            tiles, optimal = fields[:16], (fields[16] if len(fields) > 16 else None)
+            converted = [0] * 16
+            for cell, tile in enumerate(tiles):
+                converted[15 - cell] = 16 - tile if tile != 0 else 0
+            instances.append((converted, optimal))
+    save_instances("korf100", "Korf (1985) 15-puzzle instances, converted to the blank-last goal", instances)
+    return instances
+
+
+def replay(tiles, sequence):
+    # Checks that a solution really solves the board
+    state = State(int(len(tiles) ** 0.5), grid_of(list(tiles)))
+    for move in sequence:
+        if not state.perform_action(move):
+            return False
+    return state.goal_test()
+
+
+def run(name, algorithm, time_limit, memory=True, table=None):
+    # table: transposition table size for the in place IDA* ("ida"), ignored by the other solvers
+    instances = load_instances(name)
+    heuristic = INSTANCE_SETS[name].get("heuristic")
+    if heuristic is not None:
+        # built once and shared by every instance
+        heuristic = heuristics.get_heuristic(heuristic, INSTANCE_SETS[name]["size"])
+    result = {"instances": len(instances), "solved": 0, "nodes": 0, "time": 0.0, "peak_memory": 0, "suboptimal": [], "invalid": []}
+    options = {"table": TranspositionTable(table)} if table and algorithm == "ida" else {}
+    method = SOLVERS.get(algorithm) or ANYTIME_SOLVERS[algorithm]
+    probes = hits = 0
+    ratios = [] # solution length over optimal length, for the anytime solvers
+    for number, (tiles, optimal) in enumerate(instances, 1):
+        ts = TreeSearch(State(int(len(tiles) ** 0.5), grid_of(list(tiles))), heuristic=heuristic, time_limit=time_limit)
+        start = time.perf_counter()
+        sequence = getattr(ts, method)(**options)
+        elapsed = time.perf_counter() - start
+        if options:
+            probes += options["table"].probes
+            hits += options["table"].hits
+        if ts.timer is None:
+            continue # time limit exceeded
+
+        if not replay(tiles, sequence):
+            result["invalid"].append(number)
+            continue
+        result["solved"] += 1
+        result["nodes"] += ts.visit_counter
+        result["time"] += elapsed
+        if optimal is not None and len(sequence) != optimal:
+            result["suboptimal"].append(number)
+        if optimal:
+            ratios.append(len(sequence) / optimal)
+
+        if memory:
+            # a second, traced run: tracing slows the solver down too much to time the same run
+            tracemalloc.start()
+            ts = TreeSearch(State(int(len(tiles) ** 0.5), grid_of(list(tiles))), heuristic=heuristic, time_limit=time_limit)
+            getattr(ts, method)(**options)
+            result["peak_memory"] = max(result["peak_memory"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    result["nodes_per_sec"] = result["nodes"] / result["time"] if result["time"] else 0.0
+    if options:
+        result["table_hit_rate"] = hits / probes if probes else 0.0
+    if algorithm in ANYTIME_SOLVERS:
+        result["mean_suboptimality"] = sum(ratios) / len(ratios) if ratios else None
+    return result
+
+
+def compare(results, baseline, threshold):
+    # Returns the list of regressions against the baseline, a relative change above threshold counts as one
+    failures = []
+    for name, algorithms in results.items():
+        for algorithm, result in algorithms.items():
+            label = "%s/%s" % (name, algorithm)
+            suboptimal = result["suboptimal"] if algorithm in SOLVERS else []
+            if suboptimal or result["invalid"]:
+                failures.append("%s: suboptimal %s, invalid %s" % (label, suboptimal, result["invalid"]))
+            base = baseline.get(name, {}).get(algorithm)
+            if base is None:
+                continue
+            if result["solved"] < base["solved"]:
+                failures.append("%s: solved %d, baseline %d" % (label, result["solved"], base["solved"]))
+            if result["nodes"] > base["nodes"] * (1 + threshold):
+                failures.append("%s: %d nodes expanded, baseline %d" % (label, result["nodes"], base["nodes"]))
+            if result["nodes_per_sec"] < base["nodes_per_sec"] * (1 - threshold):
+                failures.append("%s: %.0f nodes/s, baseline %.0f" % (label, result["nodes_per_sec"], base["nodes_per_sec"]))
+            if base["peak_memory"] and result["peak_memory"] > base["peak_memory"] * (1 + threshold):
+                failures.append("%s: peak memory %d bytes, baseline %d" % (label, result["peak_memory"], base["peak_memory"]))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TreeSearch solvers on the stored instance sets.")
+    parser.add_argument("--sets", nargs="+", default=None, help="instance sets to run (default: all stored sets except korf100)")
+    parser.add_argument("--algorithms", nargs="+", choices=sorted(SOLVERS) + sorted(ANYTIME_SOLVERS), default=None,
+                        help="default: per set, anytime solvers run until --time-limit unless they prove optimality")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds allowed per instance (default: 60, or the set's own limit)")
+    parser.add_argument("--table", type=int, default=None, metavar="SIZE", help="transposition table entries for ida")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced runs that measure peak memory")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--save-baseline", default=None, metavar="PATH", help="write the results as the new baseline")
+    parser.add_argument("--baseline", default=None, metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--generate", action="store_true", help="regenerate the stored instance sets from their seeds")
+    parser.add_argument("--import-korf", default=None, metavar="PATH", help="convert Korf's 100 instances to instances/korf100.txt")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        for name, spec in INSTANCE_SETS.items():
+            if spec["kind"] != "imported":
+                print("Generating", name)
+                generate(name)
+        return 0
+    if args.import_korf:
+        print("Imported", len(import_korf(args.import_korf)), "instances")
+        return 0
+
+    names = args.sets or [name for name, spec in INSTANCE_SETS.items()
+                          if spec.get("default", True) and os.path.exists(os.path.join(INSTANCE_DIR, name + ".txt"))]
+    results = {}
+    for name in names:
+        results[name] = {}
+        for algorithm in args.algorithms or INSTANCE_SETS[name]["algorithms"]:
+            spec = INSTANCE_SETS[name]
+            time_limit = args.time_limit if args.time_limit is not None else spec.get("time_limit", 60)
+            result = run(name, algorithm, time_limit, not args.no_memory and spec.get("memory", True), args.table)
+            results[name][algorithm] = result
+            print("%-12s %-20s solved %3d/%-3d nodes %10d  %9.0f nodes/s  peak %8.1f MB  suboptimal %d" % (
+                name, algorithm, result["solved"], result["instances"], result["nodes"], result["nodes_per_sec"],
+                result["peak_memory"] / 1e6, len(result["suboptimal"])) +
+                  ("  table hits %.1f%%" % (100 * result["table_hit_rate"]) if "table_hit_rate" in result else "") +
+                  ("  mean length/optimal %.3f" % result["mean_suboptimality"] if result.get("mean_suboptimality") else ""))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = compare(results, baseline, args.threshold)
+    for failure in failures:
+        print("REGRESSION:", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
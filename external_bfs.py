@@ -0,0 +1,254 @@
+'''
+External memory breadth first search: enumerates the states of the sliding tile puzzle layer by layer on disk.
+
+Every layer is stored as sorted files of packed boards (the same 64-bit packing as games.PackedState). A layer is split
+into buckets by the top bits of the keys, so the bucket files read in order are the whole layer sorted, and each bucket
+is small enough to sort in memory. Expanding a layer streams it in chunks and appends the children to per bucket files
+without checking them; duplicates are only removed once the layer is done (delayed duplicate detection), by sorting each
+bucket and merging it against the same bucket of the layer before the parent layer. Sliding a tile moves the blank to a
+cell of the other color on a checkerboard, so a child of layer d can only be in layer d - 1 or d + 1 and older layers
+never need to be read again.
+
+Progress is saved after every layer in meta.json, so an interrupted search resumes from the last completed layer:
+    $python external_bfs.py 3 bfs_3x3     # full 3x3 enumeration from the goal, prints the distance histogram
+    $python external_bfs.py 4 bfs_4x4 --max-depth 25 --drop-layers
+
+The layer files are the building block for offline tables: BFS distances of every state, pattern databases built from
+abstract boards, or exact distance histograms. TreeSearch.BFS_external_solve uses it to solve a single board.
+'''
+
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+#local imports
+from frontier import BatchEngine, Layer
+import heuristics
+from games import PackedState, Shape, parse_size
+
+
+class ExternalBFS:
+    '''
+    Breadth first search from one board, with every layer on disk.
+
+    Required arguments:
+    - size: the size of the puzzle, (rows, cols) for rectangular boards (boards must fit 64 bits, so up to 16 cells)
+    - directory: where the layers and meta.json are kept, an existing search there is resumed
+    Optional
+    - start: tiles of the start board in row order, the goal by default
+    - bucket_bits: the layers are split into 2 ** bucket_bits buckets by the top bits of the keys (default 4 for 3x3 and
+      8 for 4x4); each bucket of a layer has to fit in memory
+    - chunk: number of boards expanded at once
+
+    attributes:
+    - histogram: number of boards at each distance from the start, for the completed layers
+    - completed: deepest completed layer
+
+    methods:
+    - run: expands layers until the search space is exhausted, max_depth is reached or a target board is found
+    - layer: the keys of a completed layer, a chunk per bucket, in sorted order
+    - contains: whether a completed layer holds a board
+    - path: moves from the start to a board of a completed layer
+    '''
+    def __init__(self, size, directory, start=None, bucket_bits=None, chunk=1 << 20):
+        self.shape = Shape.of(size)
+        self.size = size = self.shape.size
+        self.cells = self.shape.cells
+        self.bits, self.mask, _ = PackedState.layout(size)
+        self.total_bits = self.bits * self.cells
+        if self.total_bits > 64:
+            raise ValueError("External BFS needs boards that pack into 64 bits, %dx%d boards take %d"
+                             % (self.shape.rows, self.shape.cols, self.total_bits))
+        self.directory = directory
+        self.chunk = chunk
+        self.engine = BatchEngine(size)
+        start = list(start) if start is not None else self.shape.goal
+        self.start = PackedState.pack(start, self.bits)[0]
+        self.bucket_bits = bucket_bits if bucket_bits is not None else (4 if self.cells <= 9 else 8)
+        self.shift = self.total_bits - self.bucket_bits
+        self.shifts = np.arange(self.cells, dtype=np.uint64) * np.uint64(self.bits)
+
+        os.makedirs(directory, exist_ok=True)
+        meta = self.load_meta()
+        if meta is None:
+            # layer 0 is the start board on its own
+            self.histogram = [1]
+            self.completed = 0
+            layer = self.layer_dir(0)
+            os.makedirs(layer, exist_ok=True)
+            np.array([self.start], dtype=np.uint64).tofile(self.bucket_file(layer, self.start >> self.shift))
+            self.save_meta()
+        else:
+            if (heuristics.dimensions(meta["size"]) != (self.shape.rows, self.shape.cols)
+                    or (meta["start"], meta["bucket_bits"]) != (self.start, self.bucket_bits)):
+                raise ValueError("%s holds a different search, use another directory" % directory)
+            self.histogram = meta["histogram"]
+            self.completed = meta["completed"]
+        # a layer that was being written when the search stopped is redone from scratch
+        self.discard(self.completed + 1)
+
+    def discard(self, depth):
+        shutil.rmtree(self.layer_dir(depth) + ".children", ignore_errors=True)
+        shutil.rmtree(self.layer_dir(depth), ignore_errors=True)
+
+    def layer_dir(self, depth):
+        return os.path.join(self.directory, "layer_%04d" % depth)
+
+    def bucket_file(self, layer_dir, bucket):
+        return os.path.join(layer_dir, "bucket_%04d.bin" % bucket)
+
+    def load_meta(self):
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_meta(self):
+        # written to a temporary file and renamed, so an interruption never leaves half a meta.json
+        path = os.path.join(self.directory, "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"size": self.size, "start": self.start, "bucket_bits": self.bucket_bits,
+                       "completed": self.completed, "histogram": self.histogram}, f)
+        os.replace(path + ".tmp", path)
+
+    def read_bucket(self, depth, bucket):
+        path = self.bucket_file(self.layer_dir(depth), bucket)
+        if depth < 0 or not os.path.exists(path):
+            return np.empty(0, dtype=np.uint64)
+        return np.fromfile(path, dtype=np.uint64)
+
+    def layer(self, depth):
+        for bucket in range(1 << self.bucket_bits):
+            keys = self.read_bucket(depth, bucket)
+            if len(keys):
+                yield keys
+
+    def contains(self, depth, key):
+        keys = self.read_bucket(depth, key >> self.shift)
+        i = np.searchsorted(keys, np.uint64(key))
+        return i < len(keys) and int(keys[i]) == key
+
+    def boards(self, keys):
+        # unpacks keys into an (n, cells) array of tiles
+        return ((keys[:, None] >> self.shifts) & np.uint64(self.mask)).astype(np.uint8)
+
+    def expand(self, depth, check=None):
+        # Writes layer depth + 1 and returns its size. check is called once per chunk and returns a reason to stop or None.
+        children_dir = self.layer_dir(depth + 1) + ".children"
+        shutil.rmtree(children_dir, ignore_errors=True)
+        os.makedirs(children_dir)
+        boundaries = np.arange(1, 1 << self.bucket_bits, dtype=np.uint64) << np.uint64(self.shift)
+        for keys in self.layer(depth):
+            for begin in range(0, len(keys), self.chunk):
+                if check is not None:
+                    stop = check()
+                    if stop:
+                        return stop
+                boards = self.boards(keys[begin:begin + self.chunk])
+                n = len(boards)
+                # every move is tried, undoing the parent's move only leads back to layer depth - 1
+                children = self.engine.expand(Layer(boards, np.argmax(boards == 0, axis=1), np.zeros(n, dtype=np.int16),
+                                                    np.arange(n), np.full(n, -1, dtype=np.int8)), evaluate=False)
+                children = np.unique(children.keys)
+                # sorted, so each bucket is one slice, appended to that bucket's file of the next layer
+                cuts = np.concatenate(([0], np.searchsorted(children, boundaries), [len(children)]))
+                for bucket in np.nonzero(np.diff(cuts))[0]:
+                    with open(self.bucket_file(children_dir, bucket), "ab") as f:
+                        children[cuts[bucket]:cuts[bucket + 1]].tofile(f)
+
+        # delayed duplicate detection, one bucket at a time
+        layer_dir = self.layer_dir(depth + 1)
+        os.makedirs(layer_dir, exist_ok=True)
+        count = 0
+        for bucket in range(1 << self.bucket_bits):
+            path = self.bucket_file(children_dir, bucket)
+            if not os.path.exists(path):
+                continue
+            children = np.unique(np.fromfile(path, dtype=np.uint64))
+            children = np.setdiff1d(children, self.read_bucket(depth - 1, bucket), assume_unique=True)
+            if len(children):
+                children.tofile(self.bucket_file(layer_dir, bucket))
+                count += len(children)
+        shutil.rmtree(children_dir)
+        return count
+
+    def run(self, max_depth=None, target=None, drop_layers=False, check=None, report=None):
+        '''
+        Expands layers until no new boards are found, max_depth is reached, or target (tiles in row order) is found.
+        Returns the depth of the target (None if not reached), or the reason check gave to stop.
+        - drop_layers: delete layers once they are no longer needed for duplicate detection, only the histogram is kept
+        - check: called regularly, returns a reason to stop (e.g. "ERROR" for a time limit) or None
+        - report: called with (depth, count) after each completed layer
+        '''
+        target_key = PackedState.pack(list(target), self.bits)[0] if target is not None else None
+        if target_key is not None:
+            for depth in range(self.completed + 1):
+                if (not drop_layers or depth >= self.completed - 1) and self.contains(depth, target_key):
+                    return depth
+
+        while self.histogram[-1] and (max_depth is None or self.completed < max_depth):
+            count = self.expand(self.completed, check)
+            if isinstance(count, str):
+                self.discard(self.completed + 1)
+                return count
+            self.completed += 1
+            self.histogram.append(count)
+            self.save_meta()
+            if drop_layers:
+                shutil.rmtree(self.layer_dir(self.completed - 2), ignore_errors=True)
+            if report is not None and count:
+                report(self.completed, count)
+            if target_key is not None and self.contains(self.completed, target_key):
+                return self.completed
+        if not self.histogram[-1]:
+            # the last layer was empty, the search space is exhausted
+            self.histogram.pop()
+            self.completed -= 1
+            self.save_meta()
+        return None
+
+    def path(self, tiles, depth):
+        # Walks back from a board of layer depth, each step to a neighbour found in the layer before it
+        tiles = list(tiles)
+        sequence = []
+        for d in range(depth - 1, -1, -1):
+            empty = tiles.index(0)
+            for (dr, dc), cell in self.shape.moves[empty].items():
+                previous = tiles.copy()
+                previous[empty], previous[cell] = previous[cell], 0
+                if self.contains(d, PackedState.pack(previous, self.bits)[0]):
+                    # the move from previous to tiles takes the blank back where it was
+                    sequence.append((-dr, -dc))
+                    tiles = previous
+                    break
+            else:
+                raise ValueError("Layer %d is missing, the path cannot be read back" % d)
+        sequence.reverse()
+        return sequence
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enumerate sliding tile puzzle states layer by layer on disk.")
+    parser.add_argument("size", type=parse_size, help="e.g. 4, or 2x4 for 2 rows and 4 columns")
+    parser.add_argument("directory", help="where the layers are written, an unfinished search there is resumed")
+    parser.add_argument("--start", default=None, help="tiles of the start board in row order, the goal by default")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--bucket-bits", type=int, default=None, help="the layers are split into 2^BITS bucket files")
+    parser.add_argument("--drop-layers", action="store_true", help="keep only the layers duplicate detection needs")
+    args = parser.parse_args(argv)
+
+    start = [int(tile) for tile in args.start.replace(",", " ").split()] if args.start else None
+    bfs = ExternalBFS(args.size, args.directory, start, args.bucket_bits)
+    for depth, count in enumerate(bfs.histogram):
+        print(depth, count)
+    bfs.run(args.max_depth, drop_layers=args.drop_layers, report=lambda depth, count: print(depth, count, flush=True))
+    print("total", sum(bfs.histogram))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
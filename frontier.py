@@ -0,0 +1,198 @@
+'''
+Batched frontier engine for the sliding tile puzzle, built on numpy.
+
+A whole layer of the search is held as arrays instead of State objects: the boards as one uint8 row per board (the tiles
+in row order, 0 for the blank), plus the blank cell, heuristic, parent index and move of every board. Successors of a
+whole layer are generated with a handful of fancy indexing operations per move direction, heuristics are table lookups
+over the whole batch, and duplicates are removed by sorting packed 64-bit keys. TreeSearch.BFS_batch_solve and
+TreeSearch.beam_solve run on it:
+    ts = TreeSearch(board)
+    sequence = ts.BFS_batch_solve()
+    sequence = TreeSearch(board, heuristic="pdb:6-6-3").beam_solve(width=50000)
+
+numpy is only imported by this module, the rest of the solvers do not need it.
+'''
+
+import numpy as np
+
+#local imports
+import heuristics
+from games import PackedState, Shape, SlidingPuzzle
+
+
+class Layer:
+    '''
+    One layer of the search, every attribute is an array with one entry per board.
+    attributes:
+    - boards: (n, cells) uint8 array of the tiles in row order
+    - blanks: cell of the blank
+    - h: heuristic of each board (zeros when the search needs none)
+    - parents: index of the board in the previous layer it was generated from (-1 for the start)
+    - moves: index into SlidingPuzzle.MOVES of the move that generated it (-1 for the start)
+    - keys: packed boards, see BatchEngine.keys
+    '''
+    __slots__ = ("boards", "blanks", "h", "parents", "moves", "keys")
+
+    def __init__(self, boards, blanks, h, parents, moves, keys=None):
+        self.boards = boards
+        self.blanks = blanks
+        self.h = h
+        self.parents = parents
+        self.moves = moves
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.blanks)
+
+    def take(self, index):
+        # the boards at index, in that order
+        return Layer(self.boards[index], self.blanks[index], self.h[index], self.parents[index], self.moves[index],
+                     None if self.keys is None else self.keys[index])
+
+
+class BatchEngine:
+    '''
+    Vectorized successor generation, heuristics and duplicate detection for one puzzle size.
+
+    Required arguments:
+    - size: the size of the puzzle, (rows, cols) for rectangular boards
+    Optional
+    - heuristic: None or heuristics.Manhattan for Manhattan distance, a pattern_db.AdditivePDB, or any other heuristic of
+      a state (e.g. linear conflict), which is evaluated one board at a time and is far slower than the other two
+
+    methods:
+    - layer: the one board layer holding a state
+    - expand: every successor of a layer except the ones undoing the move that generated a board
+    - evaluate: heuristic of every board in an array
+    - keys: packed 64-bit keys of the boards in an array
+    - unique: the boards of a layer that are not repeated in it or found in an array of keys
+    - best: the boards of a layer with the lowest heuristic
+    - goals: indices of the boards in a layer that are solved
+    - path: moves leading to a board of the last layer, read back through the parents and moves of every layer
+    '''
+    def __init__(self, size, heuristic=None):
+        shape = Shape.of(size)
+        self.size = shape.size
+        cells = shape.cells
+        self.cells = cells
+
+        # neighbours[cell, k] is the cell the blank reaches with SlidingPuzzle.MOVES[k], -1 if it leaves the board
+        neighbours = np.full((cells, len(SlidingPuzzle.MOVES)), -1, dtype=np.int64)
+        for cell in range(cells):
+            for k, move in enumerate(SlidingPuzzle.MOVES):
+                neighbours[cell, k] = shape.moves[cell].get(move, -1)
+        self.neighbours = neighbours
+        self.inverse = [SlidingPuzzle.MOVES.index((-dr, -dc)) for dr, dc in SlidingPuzzle.MOVES]
+
+        # distance[tile, cell] is the Manhattan distance of the tile from its goal cell, 0 for the blank
+        self.distance = np.array(shape.distance, dtype=np.int16)
+
+        # heuristic_fn is only kept for heuristics that have no vectorized form
+        self.databases = self.heuristic_fn = None
+        if heuristic is None or type(heuristic) is heuristics.Manhattan:
+            pass
+        elif hasattr(heuristic, "databases"):
+            # one array view of every pattern database table, the memory map is not copied
+            self.databases = [(np.array(pdb.pattern), np.frombuffer(pdb.table, dtype=np.uint8)) for pdb in heuristic.databases]
+        else:
+            self.heuristic_fn = heuristic
+
+        # boards of up to 64 bits are packed exactly as PackedState does, larger ones are hashed
+        bits = PackedState.layout(self.size)[0]
+        if bits * cells <= 64:
+            self.multipliers = np.array([1 << (cell * bits) for cell in range(cells)], dtype=np.uint64)
+        else:
+            self.multipliers = np.random.default_rng(0).integers(1, 1 << 63, cells, dtype=np.uint64) | np.uint64(1)
+        self.goal = np.array(shape.goal, dtype=np.uint8)
+
+    def layer(self, state, evaluate=True):
+        boards = np.array([state.tiles()], dtype=np.uint8)
+        return Layer(boards, np.array([int(np.argmin(boards[0]))]), self.evaluate(boards) if evaluate else np.zeros(1, dtype=np.int16),
+                     np.array([-1]), np.array([-1], dtype=np.int8), self.keys(boards))
+
+    def expand(self, layer, evaluate=True):
+        parts = []
+        for k in range(len(SlidingPuzzle.MOVES)):
+            target = self.neighbours[layer.blanks, k]
+            index = np.nonzero((target >= 0) & (layer.moves != self.inverse[k]))[0]
+            if len(index) == 0:
+                continue
+            boards = layer.boards[index]
+            target = target[index]
+            blanks = layer.blanks[index]
+            rows = np.arange(len(index))
+            tiles = boards[rows, target]
+            boards[rows, blanks] = tiles
+            boards[rows, target] = 0
+            if not evaluate:
+                h = np.zeros(len(index), dtype=np.int16)
+            elif self.databases is None and self.heuristic_fn is None:
+                # only the moved tile changes its distance
+                h = layer.h[index] + self.distance[tiles, blanks] - self.distance[tiles, target]
+            else:
+                h = self.evaluate(boards)
+            parts.append(Layer(boards, target, h, index, np.full(len(index), k, dtype=np.int8)))
+        if not parts:
+            return Layer(np.empty((0, self.cells), dtype=np.uint8), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int16),
+                         np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8), np.empty(0, dtype=np.uint64))
+        boards = np.concatenate([part.boards for part in parts])
+        return Layer(boards, np.concatenate([part.blanks for part in parts]), np.concatenate([part.h for part in parts]),
+                     np.concatenate([part.parents for part in parts]), np.concatenate([part.moves for part in parts]),
+                     self.keys(boards))
+
+    def evaluate(self, boards):
+        if self.heuristic_fn is not None:
+            # board by board through a PackedState, the state the heuristic expects
+            bits = PackedState.layout(self.size)[0]
+            h = np.empty(len(boards), dtype=np.int16)
+            for n, tiles in enumerate(boards.tolist()):
+                board, empty = PackedState.pack(tiles, bits)
+                h[n] = PackedState(self.size, heuristic_fn=self.heuristic_fn, board=board, empty=empty).heuristic
+            return h
+        if self.databases is None:
+            return self.distance[boards, np.arange(self.cells)].sum(axis=1, dtype=np.int16)
+        # positions[n, tile] is the cell holding the tile on board n
+        positions = np.empty_like(boards, dtype=np.int64)
+        positions[np.arange(len(boards))[:, None], boards] = np.arange(self.cells)
+        h = np.zeros(len(boards), dtype=np.int16)
+        for pattern, table in self.databases:
+            # same mixed radix rank as PatternDatabase.rank, for every board at once
+            cells = positions[:, pattern]
+            index = np.zeros(len(boards), dtype=np.int64)
+            for i in range(len(pattern)):
+                adjusted = cells[:, i] - (cells[:, :i] < cells[:, i:i + 1]).sum(axis=1)
+                index = index * (self.cells - i) + adjusted
+            h += table[index]
+        return h
+
+    def keys(self, boards):
+        return (boards.astype(np.uint64) * self.multipliers).sum(axis=1, dtype=np.uint64)
+
+    def unique(self, layer, seen=None):
+        # seen: array of keys already reached, or None
+        keys = layer.keys
+        _, first = np.unique(keys, return_index=True)
+        first.sort() # keep generation order
+        if seen is not None and len(seen):
+            first = first[~np.isin(keys[first], seen)]
+        return layer.take(first)
+
+    def best(self, layer, width):
+        # the width boards with the lowest heuristic, kept in generation order
+        if len(layer) <= width:
+            return layer
+        index = np.argpartition(layer.h, width - 1)[:width]
+        index.sort()
+        return layer.take(index)
+
+    def goals(self, layer):
+        return np.nonzero((layer.boards == self.goal).all(axis=1))[0]
+
+    def path(self, history, index):
+        # history: (parents, moves) of every layer after the start, the searches keep only these of earlier layers
+        sequence = []
+        for parents, moves in reversed(history):
+            sequence.append(SlidingPuzzle.MOVES[moves[index]])
+            index = parents[index]
+        sequence.reverse()
+        return sequence
@@ -1,5 +1,8 @@
 import random
 
+#local imports
+import heuristics
+
 class SlidingPuzzle:
 
     MOVES = [
@@ -9,47 +12,166 @@ class SlidingPuzzle:
     (0, -1),  # Left
     ]
 
+    # size: an integer for a square board or (rows, cols) for a rectangular one, e.g. (2, 4)
     def __init__(self, size=4):
         self.size = size
         self.board = State(size=size)
 
     @staticmethod
     def check_legal_move(state, move):
-        new_row, new_col = state.emptyRow + move[0], state.emptyCol + move[1]
-        # Check if the move is legal
-        if 0 <= new_row < state.size and 0 <= new_col < state.size and abs(new_row - state.emptyRow) + abs(new_col - state.emptyCol) == 1:
-          return True
-        return False
+        # Legal moves of the blank come from its shape's table, see Shape
+        return tuple(move) in state.shape.moves[state.emptyRow * state.shape.cols + state.emptyCol]
     
     def shuffle_board(self, num_moves=100):
-        print("Shuffling the board...")
-        moves = self.MOVES.copy()
-        prev_move = (1, 0) # down
-        for _ in range(num_moves):  # Perform between 100 and 200 random moves
-            # Choose a random move, and perform it. If the move is not legal, choose another move.
-            move = random.choice(moves)
-            # Make sure the same move is not repeated twice in a row, and attempt to perform the move
-            # Note: This is not a perfect way to ensure the move won't be undone, it just won't happen immediately (short num_moves)
-            while move == prev_move or not self.board.perform_action(move):
-                move = random.choice(moves)
-            prev_move = move
+        # Random walk of num_moves moves from the current board, each picked among the legal moves that do not undo the
+        # previous one. For large sets of boards (or uniformly random ones) use scramble.py.
+        undo = None
+        for _ in range(num_moves):
+            move = random.choice([move for move in self.board.legal_actions() if move != undo])
+            self.board.perform_action(move)
+            undo = self.board.inverse_action(move)
         return self.board
 
+# Moves are stored as 2-bit codes, their index in SlidingPuzzle.MOVES, and written as the letter of the direction the
+# blank moves, e.g. "DDRU"
+MOVE_CODES = {move: code for code, move in enumerate(SlidingPuzzle.MOVES)}
+MOVE_LETTERS = "DURL"
+
+def moves_to_string(sequence):
+    return "".join(MOVE_LETTERS[MOVE_CODES[tuple(move)]] for move in sequence)
+
+def string_to_moves(text):
+    try:
+        return [SlidingPuzzle.MOVES[MOVE_LETTERS.index(letter)] for letter in text.upper()]
+    except ValueError:
+        raise ValueError("Not a move string: %r, expected letters from %s" % (text, MOVE_LETTERS)) from None
+
+def pack_moves(codes):
+    # 2 bits per move code, the first move in the lowest bits
+    packed = 0
+    for i, code in enumerate(codes):
+        packed |= code << (2 * i)
+    return packed.to_bytes((2 * len(codes) + 7) // 8, "little")
+
+def unpack_moves(data, length):
+    packed = int.from_bytes(data, "little")
+    return [(packed >> (2 * i)) & 3 for i in range(length)]
+
+class Shape:
+    '''
+    Lookup tables for one board shape, built once and shared by every state of that shape. State and PackedState pick
+    theirs when they are constructed, so moving the blank and Manhattan distance are table lookups instead of row and
+    column arithmetic.
+
+    Required arguments:
+    - size: an integer for a square board, or (rows, cols) for a rectangular one
+
+    attributes:
+    - size: the size with square boards given as an integer, the form State.size and the heuristics use
+    - rows, cols, cells: dimensions of the board
+    - moves: moves[cell] maps each legal move of a blank at cell to the cell it reaches, in SlidingPuzzle.MOVES order
+    - distance: distance[tile][cell] is the Manhattan distance of tile at cell from its goal cell, 0 for the blank
+    - goal: the tiles of the solved board in row order
+    - goal_grid: the solved board as a list of rows
+    '''
+    # size -> Shape
+    _shapes = {}
+
+    @classmethod
+    def of(cls, size):
+        size = size if isinstance(size, int) else tuple(size)
+        shape = cls._shapes.get(size)
+        if shape is None:
+            shape = cls._shapes[size] = cls(size)
+        return shape
+
+    def __init__(self, size):
+        rows, cols = heuristics.dimensions(size)
+        if rows < 2 or cols < 2:
+            raise ValueError("Boards need at least 2 rows and 2 columns, not %dx%d" % (rows, cols))
+        self.size = rows if rows == cols else (rows, cols)
+        self.rows, self.cols, self.cells = rows, cols, rows * cols
+        self.moves = []
+        for cell in range(self.cells):
+            row, col = divmod(cell, cols)
+            self.moves.append({move: (row + move[0]) * cols + col + move[1] for move in SlidingPuzzle.MOVES
+                               if 0 <= row + move[0] < rows and 0 <= col + move[1] < cols})
+        self.distance = heuristics.Manhattan(self.size).distance
+        self.goal = list(range(1, self.cells)) + [0]
+        self.goal_grid = [self.goal[row * cols:(row + 1) * cols] for row in range(rows)]
+
+def parse_size(text):
+    # Size from the command line: "4" for a square board, "ROWSxCOLS" (e.g. "2x4") for a rectangular one
+    rows, _, cols = text.lower().partition("x")
+    return int(rows) if not cols or rows == cols else (int(rows), int(cols))
+
+def updated_heuristic(state, tile, src, dst):
+    '''
+    Heuristic of the state reached by sliding tile from cell src to cell dst (cells are row * cols + col), computed
+    from state's own heuristic and the one tile that moved instead of rescanning the board.
+    Pluggable heuristics opt in by providing update(state, heuristic, tile, src, dst), otherwise None is returned
+    and the caller recomputes the heuristic in full.
+    '''
+    if state.heuristic_fn is None:
+        # Manhattan distance: only the moved tile's term changes
+        distance = state.shape.distance[tile]
+        return state.heuristic + distance[dst] - distance[src]
+    update = getattr(state.heuristic_fn, "update", None)
+    if update is None:
+        return None
+    return update(state, state.heuristic, tile, src, dst)
+
+def is_solvable(tiles, size):
+    '''
+    Checks whether a board (tiles flattened row by row, 0 for the blank) can reach the goal. Every move keeps the parity of
+    the number of inversions (pairs of tiles in the wrong order), plus on even widths the blank's row distance from the
+    bottom row, so a board is solvable exactly when that parity matches the goal's. size is an integer for square boards
+    or (rows, cols).
+    '''
+    inversions = 0
+    numbers = [tile for tile in tiles if tile != 0]
+    for i in range(len(numbers)):
+        for j in range(i + 1, len(numbers)):
+            if numbers[i] > numbers[j]:
+                inversions += 1
+    rows, cols = heuristics.dimensions(size)
+    if cols % 2 == 1:
+        return inversions % 2 == 0
+    blank_row = tiles.index(0) // cols
+    return (inversions + rows - 1 - blank_row) % 2 == 0
+
+def manhattan_between(state, target):
+    # Sum over the tiles of the Manhattan distance between their cells in state and in target
+    cols = state.shape.cols
+    target_cells = [0] * state.shape.cells
+    for cell, tile in enumerate(target.tiles()):
+        target_cells[tile] = cell
+    distance = 0
+    for cell, tile in enumerate(state.tiles()):
+        if tile != 0:
+            other = target_cells[tile]
+            distance += abs(cell // cols - other // cols) + abs(cell % cols - other % cols)
+    return distance
+
 class State:
     '''
     State class for the sliding tile puzzle: Needed by TreeSearch class to "understand" the
     current state of the puzzle and to generate new states by applying moves to the current state.
 
     Required arguments:
-    - size: the size of the puzzle
+    - size: the size of the puzzle, an integer for a square board or (rows, cols) for a rectangular one
     Optional
     - grid: the current state of the puzzle
     - parent: the previous state of the puzzle
     - action: the move that was taken to get to the current state
     - path_cost: the cost of the path from the initial state to the current state
+    - heuristic_fn: a function of a state returning its heuristic (Manhattan distance if None), passed on to successors
+    - empty: (row, col) of the empty tile, found by scanning the grid if not given
+    - heuristic: the heuristic value if already known (e.g. updated incrementally from the parent)
 
     attributes:
-    - size: the size of the puzzle
+    - size: the size of the puzzle, (rows, cols) for rectangular boards
+    - shape: the Shape holding the move and Manhattan distance tables of boards of this size
     - grid: the current state of the puzzle
     - emptyRow: the row of the empty tile
     - emptyCol: the column of the empty tile
@@ -57,7 +179,9 @@ class State:
     - parent: the previous state of the puzzle
     - action: the move that was taken to get to the current state
     - heuristic: the estimated cost of the path from the current state to the goal state
+    - heuristic_fn: the pluggable heuristic function, None for Manhattan distance
     - eval: the evaluation function for A* and IDA*
+    - shared_rows: True when rows of grid may be shared with the parent or successors, perform_action copies them first
 
     methods:
     - findEmpty: finds the empty tile in the grid
@@ -69,33 +193,73 @@ class State:
     - goal_test: checks if the current state is the goal state
     - perform_action: performs a move on the current state
     - generate_legal_successors: generates all possible moves from the current state
+    - tiles: returns the grid flattened row by row
+    - copy: returns an independent copy of the state, safe to mutate with perform_action
+    - legal_actions: returns the moves that are legal from the current state
+    - inverse_action: returns the move that undoes a move
+    - goal_state: returns the solved state of the same size
+    - distance_to: Manhattan distance to another state, a heuristic towards targets other than the goal
+    - key: returns the board packed into an integer, a compact identity for visited sets
+    - is_solvable: checks the permutation parity, False means no sequence of moves reaches the goal
+    - lower_bounds: cheap admissible estimates of the solution length (Manhattan, linear conflict)
 
     NOTE: These methods are required by the TreeSearch class, but they can be modified to suit the needs of the game.
     To use the TreeSearch class with a different game, you will need to implement a similar State class with the same methods for your game.
     '''
-    def __init__(self, size, grid=None, parent=None, action=None, path_cost=0):
-        self.size = size
+    def __init__(self, size, grid=None, parent=None, action=None, path_cost=0, heuristic_fn=None, empty=None, heuristic=None):
+        # successors share their parent's tables
+        self.shape = parent.shape if parent is not None else Shape.of(size)
+        self.size = self.shape.size
         if grid is None:
-            self.grid = self.grid = [[i + j * size + 1 for i in range(size)] for j in range(size)]
-            self.emptyRow, self.emptyCol = size - 1, size - 1
-            self.grid[self.emptyRow][self.emptyCol] = 0
+            self.grid = [row.copy() for row in self.shape.goal_grid]
+            self.emptyRow, self.emptyCol = self.shape.rows - 1, self.shape.cols - 1
         else:
             self.grid = grid
-            self.emptyRow, self.emptyCol = self.findEmpty()
+            self.emptyRow, self.emptyCol = self.findEmpty() if empty is None else empty
 
         self.path_cost = path_cost
         self.parent = parent
         self.action = action
-        self.heuristic = self.calc_heuristic()
+        self.heuristic_fn = heuristic_fn
+        self.heuristic = self.calc_heuristic() if heuristic is None else heuristic
         self.eval = self.path_cost + self.heuristic
+        self.shared_rows = False
 
     def findEmpty(self):
-        size = len(self.grid)
-        for i in range(size):
-            for j in range(size):
-                if self.grid[i][j] == 0:
+        for i, row in enumerate(self.grid):
+            for j, tile in enumerate(row):
+                if tile == 0:
                     return i, j
 
+    def tiles(self):
+        return [tile for row in self.grid for tile in row]
+
+    def copy(self):
+        return State(self.size, [row.copy() for row in self.grid], None, None, self.path_cost, self.heuristic_fn,
+                     (self.emptyRow, self.emptyCol), self.heuristic)
+
+    def legal_actions(self):
+        return list(self.shape.moves[self.emptyRow * self.shape.cols + self.emptyCol])
+
+    @staticmethod
+    def inverse_action(move):
+        return (-move[0], -move[1])
+
+    def goal_state(self):
+        return State(self.size)
+
+    def distance_to(self, other):
+        return manhattan_between(self, other)
+
+    def key(self):
+        return PackedState.pack(self.tiles(), PackedState.layout(self.size)[0])[0]
+
+    def is_solvable(self):
+        return is_solvable(self.tiles(), self.size)
+
+    def lower_bounds(self):
+        return heuristics.lower_bounds(self.tiles(), self.size)
+
     #need to make hashable type
     def __hash__(self):
         #hashing the grid as a tuple of tuples
@@ -115,45 +279,253 @@ class State:
         return self.eval > other.eval
     
     def calc_heuristic(self):
-        # Manhattan distance
-        distance = 0
-
-        size = len(self.grid)
-        for i in range(size):
-            for j in range(size):
-                if self.grid[i][j] != 0:
-                    distance += abs(i - ((self.grid[i][j]  - 1) // size)) + abs(j - (self.grid[i][j] - 1) % size) #calculate Manhattan distance for each point
-        self.heuristic = distance
-        return distance
+        # Pluggable heuristic (e.g. pattern databases), falls back to Manhattan distance
+        if self.heuristic_fn is not None:
+            self.heuristic = self.heuristic_fn(self)
+            return self.heuristic
+
+        # Manhattan distance of every tile, looked up in the shape's table
+        distance = self.shape.distance
+        cols = self.shape.cols
+        total = 0
+        for i, row in enumerate(self.grid):
+            for j, tile in enumerate(row):
+                total += distance[tile][i * cols + j]
+        self.heuristic = total
+        return total
     
     def goal_test(self):
         # This will serve as the goal test function to be passed to the TreeSearch class, can check any state for the goal
-        size = len(self.grid)
-        for row in range(size):
-            for col in range(size):
-                if self.grid[row][col] != row * size + col + 1 and (row != size - 1 or col != size - 1):
-                    return False
-        return True
+        return self.grid == self.shape.goal_grid
     
     def perform_action(self, move):
         new_row, new_col = self.emptyRow + move[0], self.emptyCol + move[1]
         # Check if the move is legal
         if SlidingPuzzle.check_legal_move(self, move):
+            # Keep the heuristic in sync with the board
+            tile = self.grid[new_row][new_col]
+            cols = self.shape.cols
+            heuristic = updated_heuristic(self, tile, new_row * cols + new_col, self.emptyRow * cols + self.emptyCol)
+            if self.shared_rows:
+                # Successors reuse the rows their move does not touch, take our own before writing to them
+                self.grid = [row.copy() for row in self.grid]
+                self.shared_rows = False
             # Swap the empty tile and the adjacent tile
             self.grid[self.emptyRow][self.emptyCol], self.grid[new_row][new_col] = self.grid[new_row][new_col], self.grid[self.emptyRow][self.emptyCol]
             self.emptyRow, self.emptyCol = new_row, new_col
+            self.heuristic = self.calc_heuristic() if heuristic is None else heuristic
+            self.eval = self.path_cost + self.heuristic
             return True
         return False
     
     def generate_legal_successors(self):
         successors = []
-        for move in SlidingPuzzle.MOVES:
-            new_row, new_col = self.emptyRow + move[0], self.emptyCol + move[1]
-            # Check if the move is legal
-            if SlidingPuzzle.check_legal_move(self, move):
-                # Create a copy of the grid
-                new_grid = [row.copy() for row in self.grid]
-                # Swap the empty tile and the adjacent tile
-                new_grid[self.emptyRow][self.emptyCol], new_grid[new_row][new_col] = new_grid[new_row][new_col], new_grid[self.emptyRow][self.emptyCol]
-                successors.append(State(self.size, new_grid, self, move, self.path_cost + 1))
-        return successors
\ No newline at end of file
+        size = self.size
+        empty_row, empty_col = self.emptyRow, self.emptyCol
+        empty = empty_row * self.shape.cols + empty_col
+        # the legal moves of the blank and the cells they reach come from the shape's table
+        for move, target in self.shape.moves[empty].items():
+            new_row, new_col = empty_row + move[0], empty_col + move[1]
+            # Copy only the rows the move touches, the other rows are never modified and can be shared
+            new_grid = self.grid.copy()
+            new_grid[empty_row] = new_grid[empty_row].copy()
+            if new_row != empty_row:
+                new_grid[new_row] = new_grid[new_row].copy()
+            # Swap the empty tile and the adjacent tile
+            tile = new_grid[new_row][new_col]
+            new_grid[empty_row][empty_col], new_grid[new_row][new_col] = tile, 0
+            # Only the moved tile changes, so the heuristic is updated from ours instead of recomputed
+            heuristic = updated_heuristic(self, tile, target, empty)
+            successor = State(size, new_grid, self, move, self.path_cost + 1, self.heuristic_fn, (new_row, new_col), heuristic)
+            successor.shared_rows = True
+            successors.append(successor)
+        # our rows are now shared with the successors too
+        self.shared_rows = True
+        return successors
+
+
+class PackedState:
+    '''
+    Compact alternative to State: the whole board is packed into a single integer with a fixed number of bits per cell
+    (4 bits for 3x3 and 4x4, so a 15-puzzle board fits in 64 bits, and wider fields for larger sizes). Moves are applied
+    by moving one tile's bits, and the hash is computed once. Implements the same methods as State, so it can be passed
+    to TreeSearch directly:
+        ts = TreeSearch(PackedState.from_state(board))
+
+    Required arguments:
+    - size: the size of the puzzle, an integer for a square board or (rows, cols) for a rectangular one
+    Optional
+    - grid: the current state of the puzzle as a list of lists (ignored if board is given)
+    - parent: the previous state of the puzzle
+    - action: the move that was taken to get to the current state
+    - path_cost: the cost of the path from the initial state to the current state
+    - heuristic_fn: a function of a state returning its heuristic (Manhattan distance if None), passed on to successors
+    - board: the packed board, cell (row * cols + col) is stored in bits [cell * bits, (cell + 1) * bits)
+    - empty: the cell of the empty tile in board
+
+    attributes:
+    - size, shape, path_cost, parent, action, heuristic, heuristic_fn, eval: same as State
+    - board: the packed board
+    - empty: the cell of the empty tile
+    - emptyRow, emptyCol: row and column of the empty tile (computed from empty)
+    - grid: the board unpacked to a list of lists (computed, use for display only)
+    '''
+    __slots__ = ("size", "shape", "board", "empty", "path_cost", "parent", "action", "heuristic_fn", "heuristic", "eval", "_hash")
+
+    # per size constants: bits per cell, mask of one cell and the packed goal board
+    _layouts = {}
+
+    def __init__(self, size, grid=None, parent=None, action=None, path_cost=0, heuristic_fn=None, board=None, empty=None):
+        self.shape = Shape.of(size)
+        self.size = size = self.shape.size
+        bits, mask, goal = self.layout(size)
+        if board is None:
+            if grid is None:
+                board, empty = goal, self.shape.cells - 1
+            else:
+                board, empty = self.pack([tile for row in grid for tile in row], bits)
+        self.board = board
+        self.empty = empty
+        self._hash = hash(board)
+
+        self.path_cost = path_cost
+        self.parent = parent
+        self.action = action
+        self.heuristic_fn = heuristic_fn
+        self.heuristic = self.calc_heuristic()
+        self.eval = self.path_cost + self.heuristic
+
+    @classmethod
+    def layout(cls, size):
+        layout = cls._layouts.get(size)
+        if layout is None:
+            rows, cols = heuristics.dimensions(size)
+            bits = max(4, (rows * cols - 1).bit_length())
+            goal, _ = cls.pack([i + 1 for i in range(rows * cols - 1)] + [0], bits)
+            layout = cls._layouts[size] = (bits, (1 << bits) - 1, goal)
+        return layout
+
+    @staticmethod
+    def pack(tiles, bits):
+        board = 0
+        empty = None
+        for cell, tile in enumerate(tiles):
+            board |= tile << (cell * bits)
+            if tile == 0:
+                empty = cell
+        return board, empty
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.size, state.grid, heuristic_fn=state.heuristic_fn)
+
+    def copy(self):
+        return PackedState(self.size, None, None, None, self.path_cost, self.heuristic_fn, self.board, self.empty)
+
+    def legal_actions(self):
+        return list(self.shape.moves[self.empty])
+
+    @staticmethod
+    def inverse_action(move):
+        return (-move[0], -move[1])
+
+    def goal_state(self):
+        return PackedState(self.size)
+
+    def distance_to(self, other):
+        return manhattan_between(self, other)
+
+    def key(self):
+        return self.board
+
+    def is_solvable(self):
+        return is_solvable(self.tiles(), self.size)
+
+    def lower_bounds(self):
+        return heuristics.lower_bounds(self.tiles(), self.size)
+
+    def tiles(self):
+        bits, mask, _ = self.layout(self.size)
+        board = self.board
+        return [(board >> (cell * bits)) & mask for cell in range(self.shape.cells)]
+
+    @property
+    def grid(self):
+        tiles = self.tiles()
+        cols = self.shape.cols
+        return [tiles[row * cols:(row + 1) * cols] for row in range(self.shape.rows)]
+
+    @property
+    def emptyRow(self):
+        return self.empty // self.shape.cols
+
+    @property
+    def emptyCol(self):
+        return self.empty % self.shape.cols
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, PackedState):
+            return self.board == other.board
+        return False
+
+    def __lt__(self, other):
+        return self.eval < other.eval
+
+    def __gt__(self, other):
+        return self.eval > other.eval
+
+    def calc_heuristic(self):
+        if self.heuristic_fn is not None:
+            self.heuristic = self.heuristic_fn(self)
+            return self.heuristic
+
+        # Manhattan distance, looked up in the shape's table
+        distance = self.shape.distance
+        self.heuristic = sum(distance[tile][cell] for cell, tile in enumerate(self.tiles()))
+        return self.heuristic
+
+    def goal_test(self):
+        return self.board == self.layout(self.size)[2]
+
+    def moved_board(self, target, tile):
+        # Board after sliding the tile at cell target into the empty cell: clear its bits and set them at the empty cell
+        bits = self.layout(self.size)[0]
+        return self.board - (tile << (target * bits)) + (tile << (self.empty * bits))
+
+    def perform_action(self, move):
+        target = self.shape.moves[self.empty].get(tuple(move))
+        if target is not None:
+            bits, mask, _ = self.layout(self.size)
+            heuristic = updated_heuristic(self, (self.board >> (target * bits)) & mask, target, self.empty)
+            self.board = self.moved_board(target, (self.board >> (target * bits)) & mask)
+            self.empty = target
+            self._hash = hash(self.board)
+            self.heuristic = self.calc_heuristic() if heuristic is None else heuristic
+            self.eval = self.path_cost + self.heuristic
+            return True
+        return False
+
+    def generate_legal_successors(self):
+        successors = []
+        size = self.size
+        bits, mask, _ = self.layout(size)
+        for move, target in self.shape.moves[self.empty].items():
+            tile = (self.board >> (target * bits)) & mask
+            heuristic = updated_heuristic(self, tile, target, self.empty)
+            child = PackedState.__new__(PackedState)
+            child.size = size
+            child.shape = self.shape
+            child.board = self.moved_board(target, tile)
+            child.empty = target
+            child._hash = hash(child.board)
+            child.path_cost = self.path_cost + 1
+            child.parent = self
+            child.action = move
+            child.heuristic_fn = self.heuristic_fn
+            child.heuristic = child.calc_heuristic() if heuristic is None else heuristic
+            child.eval = child.path_cost + child.heuristic
+            successors.append(child)
+        return successors
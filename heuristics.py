@@ -0,0 +1,305 @@
+'''
+Heuristic functions for the sliding tile puzzle, computed from a board flattened row by row (0 for the blank). Sizes are
+integers for square boards or (rows, cols) pairs for rectangular ones.
+
+The classes below are pluggable heuristics for State and TreeSearch: they are built for one puzzle size, called with a
+state to get its heuristic, and provide update(state, heuristic, tile, src, dst) to get the heuristic after sliding tile
+from cell src to cell dst from the value before the move. Heuristics that may overestimate have admissible = False, the
+solvers do not cache the solutions found with them. They are looked up by name through the registry:
+    ts = TreeSearch(board, heuristic="linear_conflict")
+    ts = TreeSearch(board, heuristic="max:linear_conflict,walking_distance")
+    ts = TreeSearch(board, heuristic="pdb:6-6-3")
+'''
+
+from bisect import bisect_left
+from collections import deque
+
+
+def dimensions(size):
+    # (rows, cols) of a puzzle size
+    return (size, size) if isinstance(size, int) else (size[0], size[1])
+
+
+def manhattan_distance(tiles, size):
+    # Sum over the tiles of the row and column distance to their goal cells
+    cols = dimensions(size)[1]
+    distance = 0
+    for cell, tile in enumerate(tiles):
+        if tile != 0:
+            distance += abs(cell // cols - (tile - 1) // cols) + abs(cell % cols - (tile - 1) % cols)
+    return distance
+
+
+def line_conflicts(goals):
+    # Fewest tiles to take out of a line so the rest are already in goal order: the line length minus the longest
+    # increasing run of goal positions. Each of those tiles has to step out of the line and back, costing 2 extra moves.
+    tails = []
+    for goal in goals:
+        i = bisect_left(tails, goal)
+        if i == len(tails):
+            tails.append(goal)
+        else:
+            tails[i] = goal
+    return len(goals) - len(tails)
+
+
+def row_conflicts(tiles, size, row):
+    cols = dimensions(size)[1]
+    return line_row_conflicts(tiles[row * cols:(row + 1) * cols], cols, row)
+
+
+def col_conflicts(tiles, size, col):
+    cols = dimensions(size)[1]
+    return line_col_conflicts(tiles[col::cols], cols, col)
+
+
+def line_row_conflicts(line, cols, row):
+    # goal columns of the tiles in this row that belong in this row, in the order they appear
+    return line_conflicts([(tile - 1) % cols for tile in line if tile != 0 and (tile - 1) // cols == row])
+
+
+def line_col_conflicts(line, cols, col):
+    return line_conflicts([(tile - 1) // cols for tile in line if tile != 0 and (tile - 1) % cols == col])
+
+
+def linear_conflict(tiles, size):
+    # Manhattan distance plus 2 moves for every tile that must leave its goal row or column to let another tile past
+    rows, cols = dimensions(size)
+    conflicts = sum(row_conflicts(tiles, size, row) for row in range(rows))
+    conflicts += sum(col_conflicts(tiles, size, col) for col in range(cols))
+    return manhattan_distance(tiles, size) + 2 * conflicts
+
+
+def lower_bounds(tiles, size):
+    # Cheap admissible estimates of the solution length, reported before searching
+    return {
+        "manhattan": manhattan_distance(tiles, size),
+        "linear_conflict": linear_conflict(tiles, size),
+    }
+
+
+class Manhattan:
+    '''
+    Manhattan distance with a precomputed distance[tile][cell] table.
+    '''
+    def __init__(self, size):
+        self.size = size
+        rows, cols = dimensions(size)
+        cells = rows * cols
+        self.distance = [[0] * cells] + [[abs(cell // cols - (tile - 1) // cols) + abs(cell % cols - (tile - 1) % cols)
+                                          for cell in range(cells)] for tile in range(1, cells)]
+
+    def __call__(self, state):
+        distance = self.distance
+        return sum(distance[tile][cell] for cell, tile in enumerate(state.tiles()))
+
+    def update(self, state, heuristic, tile, src, dst):
+        return heuristic + self.distance[tile][dst] - self.distance[tile][src]
+
+
+class LinearConflict(Manhattan):
+    '''
+    Manhattan distance plus 2 for every tile that has to leave its goal row or column to let another tile past.
+    A horizontal move only changes the conflicts of the two columns involved and a vertical move those of the two rows.
+    '''
+    def __call__(self, state):
+        return linear_conflict(state.tiles(), self.size)
+
+    def update(self, state, heuristic, tile, src, dst):
+        cols = dimensions(self.size)[1]
+        tiles = state.tiles()
+        change = 0
+        # the cells the move empties and fills lie in two different lines, each is sliced out and changed on its own
+        for cell, new in ((src, 0), (dst, tile)):
+            row, col = divmod(cell, cols)
+            if src // cols == dst // cols:
+                # horizontal move: the columns of both cells change
+                line = tiles[col::cols]
+                before = line_col_conflicts(line, cols, col)
+                line[row] = new
+                change += line_col_conflicts(line, cols, col) - before
+            else:
+                line = tiles[row * cols:(row + 1) * cols]
+                before = line_row_conflicts(line, cols, row)
+                line[col] = new
+                change += line_row_conflicts(line, cols, row) - before
+        return heuristic + self.distance[tile][dst] - self.distance[tile][src] + 2 * change
+
+
+class WalkingDistance:
+    '''
+    Walking distance (Takahashi): the vertical part only looks at how many tiles of each goal row sit in each row and
+    which row the blank is in, the horizontal part does the same for columns. The exact number of moves to solve each of
+    these relaxed puzzles comes from a table built once per board shape by breadth first search from the goal (24964
+    entries for the 15-puzzle); on square boards both parts share a table by symmetry. A move only changes one count and
+    the blank's line in one of the two parts, so update() keeps the keys and distances of recent states by state key, as
+    Combined does, and only rebuilds the part that changes.
+    '''
+    # (lines, line length) -> {key: distance}, shared by every instance
+    _tables = {}
+
+    def __init__(self, size, cache_size=4096):
+        self.size = size
+        rows, cols = dimensions(size)
+        self.vertical = self.table(rows, cols)
+        self.horizontal = self.table(cols, rows)
+        self.bits = max(4, (rows * cols - 1).bit_length())
+        self.cache_size = cache_size
+        self.cache = {} # state key -> (vertical key, horizontal key, vertical distance, horizontal distance)
+
+    @classmethod
+    def table(cls, lines, length):
+        if (lines, length) not in cls._tables:
+            cls._tables[(lines, length)] = cls.build(lines, length)
+        return cls._tables[(lines, length)]
+
+    @staticmethod
+    def build(lines, length):
+        # a key is the lines x lines matrix counts[line][goal line] flattened, followed by the blank's line; every line
+        # holds length cells
+        size = lines
+        counts = [0] * (size * size)
+        for line in range(size):
+            counts[line * size + line] = length
+        counts[-1] -= 1 # the blank's cell
+        goal = tuple(counts) + (size - 1,)
+        table = {goal: 0}
+        frontier = deque([goal])
+        while frontier:
+            key = frontier.popleft()
+            distance = table[key] + 1
+            blank = key[-1]
+            for line in (blank - 1, blank + 1):
+                if not 0 <= line < size:
+                    continue
+                for goal_line in range(size):
+                    if key[line * size + goal_line] == 0:
+                        continue
+                    # a tile of goal_line moves from line into the blank's line
+                    new = list(key)
+                    new[line * size + goal_line] -= 1
+                    new[blank * size + goal_line] += 1
+                    new[-1] = line
+                    new = tuple(new)
+                    if new not in table:
+                        table[new] = distance
+                        frontier.append(new)
+        return table
+
+    def keys(self, tiles):
+        rows, cols = dimensions(self.size)
+        vertical = [0] * (rows * rows + 1)
+        horizontal = [0] * (cols * cols + 1)
+        for cell, tile in enumerate(tiles):
+            row, col = divmod(cell, cols)
+            if tile == 0:
+                vertical[-1], horizontal[-1] = row, col
+            else:
+                goal_row, goal_col = divmod(tile - 1, cols)
+                vertical[row * rows + goal_row] += 1
+                horizontal[col * cols + goal_col] += 1
+        return vertical, horizontal
+
+    def __call__(self, state):
+        vertical, horizontal = self.keys(state.tiles())
+        return self.vertical[tuple(vertical)] + self.horizontal[tuple(horizontal)]
+
+    def update(self, state, heuristic, tile, src, dst):
+        rows, cols = dimensions(self.size)
+        key = state.key()
+        parts = self.cache.get(key)
+        if parts is None:
+            vertical, horizontal = self.keys(state.tiles())
+            vertical, horizontal = tuple(vertical), tuple(horizontal)
+            parts = self.cache[key] = (vertical, horizontal, self.vertical[vertical], self.horizontal[horizontal])
+        vertical, horizontal, vertical_distance, horizontal_distance = parts
+        src_row, src_col = divmod(src, cols)
+        dst_row, dst_col = divmod(dst, cols)
+        goal_row, goal_col = divmod(tile - 1, cols)
+        # the tile leaves its line for the blank's, and the blank takes the tile's place
+        if src_row != dst_row:
+            changed = list(vertical)
+            changed[src_row * rows + goal_row] -= 1
+            changed[dst_row * rows + goal_row] += 1
+            changed[-1] = src_row
+            vertical = tuple(changed)
+            vertical_distance = self.vertical[vertical]
+        else:
+            changed = list(horizontal)
+            changed[src_col * cols + goal_col] -= 1
+            changed[dst_col * cols + goal_col] += 1
+            changed[-1] = src_col
+            horizontal = tuple(changed)
+            horizontal_distance = self.horizontal[horizontal]
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[key - (tile << (src * self.bits)) + (tile << (dst * self.bits))] = (vertical, horizontal, vertical_distance, horizontal_distance)
+        return vertical_distance + horizontal_distance
+
+
+class Combined:
+    '''
+    Maximum (always admissible) or sum (admissible only if the parts count disjoint moves) of other heuristics.
+    update() needs every part's value before the move, so the parts computed for recent states are kept by state key
+    (the packed board, as in games.PackedState): the successors of a state share its parts, and the parts worked out
+    for a successor are ready when it is expanded in turn.
+    '''
+    def __init__(self, parts, combine=max, cache_size=4096):
+        self.parts = parts
+        self.combine = combine
+        self.size = parts[0].size
+        rows, cols = dimensions(self.size)
+        self.bits = max(4, (rows * cols - 1).bit_length())
+        self.cache_size = cache_size
+        self.cache = {} # state key -> value of every part
+        # a sum of heuristics that count the same moves overestimates
+        self.admissible = combine is max and all(getattr(part, "admissible", True) for part in parts)
+
+    def __call__(self, state):
+        return self.combine(part(state) for part in self.parts)
+
+    def update(self, state, heuristic, tile, src, dst):
+        if not all(hasattr(part, "update") for part in self.parts):
+            return None # the caller recomputes in full
+        key = state.key()
+        values = self.cache.get(key)
+        if values is None:
+            values = [part(state) for part in self.parts]
+        values = [part.update(state, value, tile, src, dst) for part, value in zip(self.parts, values)]
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[key - (tile << (src * self.bits)) + (tile << (dst * self.bits))] = values
+        return self.combine(values)
+
+
+# Heuristic factories by name, each called with the puzzle size
+HEURISTICS = {
+    "manhattan": Manhattan,
+    "linear_conflict": LinearConflict,
+    "walking_distance": WalkingDistance,
+}
+
+
+def register(name, factory):
+    HEURISTICS[name] = factory
+
+
+def get_heuristic(spec, size):
+    '''
+    Builds a heuristic from its name for the given puzzle size:
+    - a registered name, e.g. "linear_conflict"
+    - "max:name,name,..." or "sum:name,name,..." for combinations
+    - "pdb:partition" for the additive pattern databases, e.g. "pdb:6-6-3"
+    Anything that is not a string is assumed to already be a heuristic and returned unchanged.
+    '''
+    if not isinstance(spec, str):
+        return spec
+    kind, _, rest = spec.partition(":")
+    if kind in ("max", "sum") and rest:
+        return Combined([get_heuristic(name.strip(), size) for name in rest.split(",")], max if kind == "max" else sum)
+    if kind == "pdb" and rest:
+        from pattern_db import AdditivePDB
+        return AdditivePDB.load_or_build(size, rest)
+    if spec not in HEURISTICS:
+        raise ValueError("Unknown heuristic %r, expected one of %s, max:..., sum:... or pdb:..." % (spec, ", ".join(sorted(HEURISTICS))))
+    return HEURISTICS[spec](size)
@@ -1,17 +1,23 @@
 import pygame
 import sys
 import time
+from collections import deque
 
 #local imports
 from games import *
-from tree_search import TreeSearch
+from tree_search import TreeSearch, BackgroundSolver
+from solution_cache import SolutionCache
 
 # Constants
 
 GRID_SIZE = 4
-WIDTH, HEIGHT = GRID_SIZE * 50, (GRID_SIZE + 1) * 50
+STATUS_HEIGHT = 25 # line under the buttons showing the solver's progress
+WIDTH, HEIGHT = GRID_SIZE * 50, (GRID_SIZE + 1) * 50 + STATUS_HEIGHT
 TILE_SIZE = 50
 BUTTON_WIDTH, BUTTON_HEIGHT = WIDTH // 8 , 50
+BUTTON_SIZE = WIDTH // 4
+MOVE_TIME = 0.15 # seconds to slide a tile when playing back a solution
+SOLVERS = {1: ("BFS", "BFS_solve"), 2: ("A*", "A_star_solve"), 3: ("IDA* (in place)", "IDA_star_inplace_solve")} # button -> solver
 
 # Colors
 WHITE = (255, 255, 255)
@@ -26,12 +32,32 @@ GREEN = (0, 255, 0)
 pygame.init()
 pygame.font.init()
 FONT = pygame.font.Font(None, 36)
+STATUS_FONT = pygame.font.Font(None, 20)
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Sliding Tile Puzzle")
+clock = pygame.time.Clock()
 
 # Initialize the game board
 main_view = SlidingPuzzle(GRID_SIZE)
 
+# Boards solved before (or their mirror images) are answered at once, reshuffling with few moves repeats them often
+CACHE = SolutionCache()
+
+# Solves run on a background thread so the window keeps responding; their moves are then played back one by one
+solver = None
+pending_moves = deque()
+sliding = None # (tile, from row, from col, to row, to col, start time) of the tile being animated
+status = ""
+
+def stop_solving():
+    # Called whenever the board changes under a running solve or a playback, their moves are stale
+    global solver, sliding
+    if solver is not None:
+        solver.cancel()
+        solver = None
+    pending_moves.clear()
+    sliding = None
+
 # Main game loop
 while True:
     for event in pygame.event.get():
@@ -46,30 +72,49 @@ while True:
             moved = main_view.board.perform_action((row - main_view.board.emptyRow, col - main_view.board.emptyCol))
             if moved:
                 print("Moved tile") # REMOVE LATER  
+                stop_solving()
+                status = ""
             col = mouse_x // BUTTON_SIZE
             if (row == GRID_SIZE) and (0 <= col < 4):
-                ts = TreeSearch(main_view.board) # Initialize the tree search object
-                sequence = []
+                stop_solving()
                 
                 match col:
                     
                     case 0:
                         main_view.shuffle_board(50)
-                    case 1:
-                        print("Solving with BFS")
-                        sequence = ts.BFS_solve()
-                    case 2: 
-                        print("Solving with A*")
-                        sequence = ts.A_star_solve()
-                    case 3:
-                        print("Solving with IDA*")
-                        sequence = ts.IDA_star_solve()
+                        status = ""
+                    case 1 | 2 | 3:
+                        name, method = SOLVERS[col]
+                        print("Solving with", name)
+                        # the solver gets its own copy, the board on screen can change while it runs
+                        solver = BackgroundSolver(TreeSearch(main_view.board.copy(), cache=CACHE), method).start()
                     case _:
                         pass
-                if sequence:
-                    print("Recieved sequence: ", sequence) # REMOVE LATER
-                    for move in sequence:
-                        main_view.board.perform_action(move)
+
+    # Poll the background solver
+    if solver is not None:
+        if solver.done():
+            sequence = solver.result
+            if sequence:
+                print("Recieved sequence: ", sequence) # REMOVE LATER
+                pending_moves.extend(sequence)
+                status = "%s: %d moves, %d nodes" % (solver.search.algorithm, len(sequence), solver.search.visit_counter)
+            else:
+                status = "No solution found" if not main_view.board.goal_test() else "Already solved"
+            solver = None
+        else:
+            progress = solver.progress()
+            status = "Nodes %d  Bound %s  %ds" % (progress["expanded"], progress["bound"], progress["elapsed"])
+
+    # Play back the solution one sliding tile at a time
+    if sliding is not None and time.time() - sliding[5] >= MOVE_TIME:
+        sliding = None
+    if sliding is None and pending_moves:
+        move = pending_moves.popleft()
+        from_row, from_col = main_view.board.emptyRow + move[0], main_view.board.emptyCol + move[1]
+        tile = main_view.board.grid[from_row][from_col]
+        main_view.board.perform_action(move)
+        sliding = (tile, from_row, from_col, from_row - move[0], from_col - move[1], time.time())
 
     # Draw the game board
     screen.fill(WHITE)
@@ -77,9 +122,15 @@ while True:
         for col in range(GRID_SIZE):
             tile = main_view.board.grid[row][col]
             if tile != 0:
-                pygame.draw.rect(screen, BLACK, (col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+                x, y = col * TILE_SIZE, row * TILE_SIZE
+                if sliding is not None and tile == sliding[0]:
+                    # part way between the cell it left and the cell it is moving to
+                    t = min((time.time() - sliding[5]) / MOVE_TIME, 1)
+                    x = round((sliding[2] + (sliding[4] - sliding[2]) * t) * TILE_SIZE)
+                    y = round((sliding[1] + (sliding[3] - sliding[1]) * t) * TILE_SIZE)
+                pygame.draw.rect(screen, BLACK, (x, y, TILE_SIZE, TILE_SIZE))
                 text = FONT.render(str(tile), True, WHITE)
-                text_rect = text.get_rect(center=(col * TILE_SIZE + TILE_SIZE // 2, row * TILE_SIZE + TILE_SIZE // 2))
+                text_rect = text.get_rect(center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
                 screen.blit(text, text_rect)
 
     # Draw buttons around the empty tile
@@ -87,7 +138,6 @@ while True:
 
 
     # Draw the buttons for the algorithms at the bottom of the screen, and the shuffle button using RED, BLUE, YELLOW, and GREEN
-    BUTTON_SIZE = WIDTH // 4
 
     pygame.draw.rect(screen, RED,       (0              , GRID_SIZE * TILE_SIZE, BUTTON_SIZE, BUTTON_HEIGHT))
     pygame.draw.rect(screen, BLUE,      (BUTTON_SIZE    , GRID_SIZE * TILE_SIZE, BUTTON_SIZE, BUTTON_HEIGHT))
@@ -107,6 +157,9 @@ while True:
     # Link the buttons to the algorithms
     
 
-    
+    # Solver progress or result under the buttons
+    text = STATUS_FONT.render(status, True, BLACK)
+    screen.blit(text, text.get_rect(midleft=(5, (GRID_SIZE + 1) * TILE_SIZE + STATUS_HEIGHT // 2)))
 
     pygame.display.flip()
+    clock.tick(60) # also leaves the solver thread the rest of each frame
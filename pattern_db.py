@@ -0,0 +1,254 @@
+'''
+Disjoint additive pattern databases for the sliding tile puzzle.
+
+A pattern database (PDB) stores, for every placement of a subset of the tiles (the "pattern"), the minimum number of
+moves of those tiles needed to bring them to their goal cells. Only moves of pattern tiles are counted, so the values of
+disjoint patterns can be added together and still never overestimate the true solution length.
+
+Tables are built once by a backward breadth first search from the goal, written to disk as one byte per entry and
+memory mapped when loaded, so every process solving puzzles shares the same pages.
+
+Building a table is done offline:
+    $python pattern_db.py 4 6-6-3
+'''
+
+import mmap
+import os
+import sys
+from collections import deque
+
+#local imports
+from heuristics import dimensions
+
+# Directory holding the precomputed tables
+PDB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdb")
+
+# Marker for table entries the search has not reached (never happens once a table is complete)
+UNKNOWN = 255
+
+# Disjoint partitions of the tiles, keyed by puzzle size and then by name
+PARTITIONS = {
+    3: {
+        "4-4": [(1, 2, 3, 4), (5, 6, 7, 8)],
+    },
+    4: {
+        "6-6-3": [(1, 5, 6, 9, 10, 13), (7, 8, 11, 12, 14, 15), (2, 3, 4)],
+        "7-8": [(1, 2, 3, 4, 5, 6, 7), (8, 9, 10, 11, 12, 13, 14, 15)],  # needs several GB of RAM to build
+    },
+}
+
+
+class PatternDatabase:
+    '''
+    Pattern database for a single pattern of tiles.
+
+    Required arguments:
+    - size: the size of the puzzle
+    - pattern: tuple of the tiles in the pattern
+    Optional
+    - table: a bytes-like object holding the precomputed distances (built or loaded if not given)
+
+    attributes:
+    - size: the size of the puzzle
+    - pattern: tuple of the tiles in the pattern
+    - cells: number of cells on the board
+    - entries: number of placements of the pattern tiles, the length of the table
+    - table: one byte per placement, indexed by rank()
+    - directory: the directory the table was loaded from, None if it only exists in memory
+
+    methods:
+    - rank: maps the cells of the pattern tiles to a table index
+    - unrank: maps a table index back to the cells of the pattern tiles
+    - build: fills the table with a backward breadth first search from the goal
+    - save: writes the table to disk
+    - load: memory maps a table from disk
+    - lookup: returns the distance stored for a state
+    '''
+    def __init__(self, size, pattern, table=None):
+        self.size = size
+        self.pattern = tuple(pattern)
+        rows, cols = dimensions(size)
+        self.cells = rows * cols
+        self.entries = 1
+        for i in range(len(self.pattern)):
+            self.entries *= self.cells - i
+        self.table = table
+        self.directory = None # set when the table is memory mapped from disk
+
+    def __getstate__(self):
+        # memory maps cannot be pickled, worker processes map the same file again instead
+        state = self.__dict__.copy()
+        if self.directory is not None:
+            state["table"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.table is None:
+            self.table = PatternDatabase.load(self.size, self.pattern, self.directory).table
+
+    @staticmethod
+    def filename(size, pattern):
+        rows, cols = dimensions(size)
+        shape = "%d" % rows if rows == cols else "%dx%d" % (rows, cols)
+        return "pdb_%s_%s.bin" % (shape, "-".join(str(tile) for tile in pattern))
+
+    def rank(self, positions):
+        # Mixed radix rank of a partial permutation: the i-th tile has (cells - i) cells left to choose from
+        index = 0
+        for i, pos in enumerate(positions):
+            adjusted = pos
+            for prev in positions[:i]:
+                if prev < pos:
+                    adjusted -= 1
+            index = index * (self.cells - i) + adjusted
+        return index
+
+    def unrank(self, index):
+        k = len(self.pattern)
+        digits = [0] * k
+        for i in range(k - 1, -1, -1):
+            index, digits[i] = divmod(index, self.cells - i)
+        positions = []
+        for digit in digits:
+            # the digit counts free cells, skip the ones already taken by earlier tiles
+            pos = digit
+            for prev in sorted(positions):
+                if prev <= pos:
+                    pos += 1
+            positions.append(pos)
+        return positions
+
+    def build(self):
+        # 0-1 breadth first search backwards from the goal over (pattern placement, blank cell).
+        # Moving a pattern tile costs 1, moving any other tile costs 0, which keeps the partitions additive.
+        rows, cols = dimensions(self.size)
+        cells = self.cells
+        neighbours = []
+        for cell in range(cells):
+            row, col = divmod(cell, cols)
+            neighbours.append([r * cols + c for r, c in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1))
+                               if 0 <= r < rows and 0 <= c < cols])
+
+        dist = bytearray([UNKNOWN]) * (self.entries * cells)
+        start = self.rank([tile - 1 for tile in self.pattern]) * cells + cells - 1
+        dist[start] = 0
+        frontier = deque([start])
+
+        while frontier:
+            node = frontier.popleft()
+            index, blank = divmod(node, cells)
+            d = dist[node]
+            positions = self.unrank(index)
+            for nb in neighbours[blank]:
+                if nb in positions:
+                    # a pattern tile slides into the blank
+                    moved = positions.copy()
+                    moved[positions.index(nb)] = blank
+                    child = self.rank(moved) * cells + nb
+                    if dist[child] > d + 1:
+                        dist[child] = d + 1
+                        frontier.append(child)
+                else:
+                    child = index * cells + nb
+                    if dist[child] > d:
+                        dist[child] = d
+                        frontier.appendleft(child)
+
+        # the heuristic does not know where the blank is, so take the best case over all blank cells
+        table = bytearray(self.entries)
+        for index in range(self.entries):
+            table[index] = min(dist[index * cells:(index + 1) * cells])
+        self.table = table
+        return table
+
+    def save(self, directory=PDB_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename(self.size, self.pattern))
+        with open(path, "wb") as f:
+            f.write(self.table)
+        return path
+
+    @classmethod
+    def load(cls, size, pattern, directory=PDB_DIR):
+        path = os.path.join(directory, cls.filename(size, pattern))
+        with open(path, "rb") as f:
+            # the mapping stays valid after the file is closed
+            table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        pdb = cls(size, pattern, table)
+        pdb.directory = directory
+        if len(table) != pdb.entries:
+            raise ValueError("Pattern database %s is corrupt: expected %d entries, found %d" % (path, pdb.entries, len(table)))
+        return pdb
+
+    @classmethod
+    def load_or_build(cls, size, pattern, directory=PDB_DIR):
+        try:
+            return cls.load(size, pattern, directory)
+        except FileNotFoundError:
+            pdb = cls(size, pattern)
+            pdb.build()
+            pdb.save(directory)
+            return cls.load(size, pattern, directory)
+
+    def lookup(self, state):
+        positions = tile_positions(state)
+        return self.table[self.rank([positions[tile] for tile in self.pattern])]
+
+
+class AdditivePDB:
+    '''
+    Sum of the pattern databases of a disjoint partition, usable as a heuristic function by State and TreeSearch:
+        heuristic = AdditivePDB.load_or_build(4, "6-6-3")
+        ts = TreeSearch(board, heuristic=heuristic)
+
+    Required arguments:
+    - databases: list of PatternDatabase objects whose patterns do not overlap
+    '''
+    def __init__(self, databases):
+        self.databases = databases
+        self.size = databases[0].size
+        # database containing each tile
+        self.owner = {tile: pdb for pdb in databases for tile in pdb.pattern}
+
+    @classmethod
+    def load_or_build(cls, size, partition, directory=PDB_DIR):
+        if partition not in PARTITIONS.get(size, {}):
+            raise ValueError("No partition %r for size %r, expected one of %s" % (partition, size, ", ".join(PARTITIONS.get(size, {})) or "none"))
+        return cls([PatternDatabase.load_or_build(size, pattern, directory) for pattern in PARTITIONS[size][partition]])
+
+    def __call__(self, state):
+        positions = tile_positions(state)
+        total = 0
+        for pdb in self.databases:
+            total += pdb.table[pdb.rank([positions[tile] for tile in pdb.pattern])]
+        return total
+
+    def update(self, state, heuristic, tile, src, dst):
+        # Incremental update used by successor generation: only the database holding the moved tile changes
+        pdb = self.owner.get(tile)
+        if pdb is None:
+            return heuristic
+        positions = tile_positions(state)
+        old = pdb.table[pdb.rank([positions[t] for t in pdb.pattern])]
+        positions[tile] = dst
+        return heuristic - old + pdb.table[pdb.rank([positions[t] for t in pdb.pattern])]
+
+
+def tile_positions(state):
+    # positions[tile] is the cell (row * cols + col) the tile currently occupies
+    tiles = state.tiles()
+    positions = [0] * len(tiles)
+    for cell, tile in enumerate(tiles):
+        positions[tile] = cell
+    return positions
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    partition = sys.argv[2] if len(sys.argv) > 2 else next(iter(PARTITIONS[size]))
+    for pattern in PARTITIONS[size][partition]:
+        print("Building pattern database for tiles", pattern)
+        pdb = PatternDatabase(size, pattern)
+        pdb.build()
+        print("Saved to", pdb.save())
@@ -0,0 +1,150 @@
+'''
+Random boards for the sliding tile puzzle, generated in bulk with numpy.
+
+Two kinds of boards, both reproducible from a seed:
+- uniformly random solvable boards: random permutations, with two tiles swapped on the ones of the wrong parity (this
+  pairs every unsolvable permutation with exactly one solvable one, so the result stays uniform)
+- random walks of exactly depth blank moves from the goal, never undoing the previous move; their solution length is at
+  most depth and has the parity of depth, but can be shorter
+
+Sizes are integers for square boards or (rows, cols) for rectangular ones. Boards come as (count, cells) uint8 arrays of
+the tiles in row order, or packed into 64-bit keys the same way as games.PackedState for boards of up to 16 cells. Whole
+batches are generated at once, hundreds of thousands of boards per second:
+    boards = random_boards(4, 100000, seed=0)
+    keys = pack(random_walks(4, 60, 100000, seed=0), 4)
+    $python scramble.py 4 1000 --seed 0 > boards.txt            # one board per line, ready for batch.py
+    $python scramble.py 4 1000 --depth 40 --seed 0 > walks.txt
+    $python scramble.py 3x5 1000 --seed 0 > boards_3x5.txt
+
+random_board and random_walk make single boards from a random.Random, for the stored benchmark instance sets.
+'''
+
+import argparse
+import sys
+
+import numpy as np
+
+#local imports
+from games import PackedState, Shape, SlidingPuzzle, is_solvable, parse_size
+
+
+def random_board(size, rng):
+    # Uniformly random solvable board: a random permutation, with two tiles swapped if it has the wrong parity
+    tiles = list(range(Shape.of(size).cells))
+    rng.shuffle(tiles)
+    if not is_solvable(tiles, size):
+        first, second = [cell for cell, tile in enumerate(tiles) if tile != 0][:2]
+        tiles[first], tiles[second] = tiles[second], tiles[first]
+    return tiles
+
+
+def random_walk(size, depth, rng):
+    # Board reached by depth random blank moves from the goal, never undoing the previous move
+    shape = Shape.of(size)
+    tiles = shape.goal.copy()
+    empty = shape.cells - 1
+    previous = None
+    for _ in range(depth):
+        moves = [move for move in shape.moves[empty] if move != previous]
+        dr, dc = rng.choice(moves)
+        target = shape.moves[empty][(dr, dc)]
+        tiles[empty], tiles[target] = tiles[target], 0
+        empty = target
+        previous = (-dr, -dc)
+    return tiles
+
+
+def solvable(boards, size):
+    # Whether each board of a (count, cells) array can reach the goal, the same test as games.is_solvable
+    shape = Shape.of(size)
+    inversions = np.zeros(len(boards), dtype=np.int64)
+    for i in range(shape.cells - 1):
+        later = boards[:, i + 1:]
+        inversions += ((later < boards[:, i:i + 1]) & (later != 0)).sum(axis=1)
+    if shape.cols % 2 == 0:
+        inversions += shape.rows - 1 - np.argmin(boards, axis=1) // shape.cols
+    return inversions % 2 == 0
+
+
+def random_boards(size, count, seed=None):
+    '''
+    count uniformly random solvable boards as a (count, cells) uint8 array.
+    seed: an integer or a numpy Generator, None for a fresh random one
+    '''
+    rng = np.random.default_rng(seed)
+    cells = Shape.of(size).cells
+    boards = rng.permuted(np.tile(np.arange(cells, dtype=np.uint8), (count, 1)), axis=1)
+    wrong = np.nonzero(~solvable(boards, size))[0]
+    # swap the first two tiles, skipping the blank
+    first = np.where(boards[wrong, 0] != 0, 0, 1)
+    second = np.where(boards[wrong, first + 1] != 0, first + 1, first + 2)
+    boards[wrong, first], boards[wrong, second] = boards[wrong, second], boards[wrong, first]
+    return boards
+
+
+def random_walks(size, depth, count, seed=None):
+    '''
+    count boards reached by depth random blank moves from the goal, never undoing the previous move, as a (count, cells)
+    uint8 array. Every step picks uniformly among the moves left, for all the boards at once.
+    seed: an integer or a numpy Generator, None for a fresh random one
+    '''
+    rng = np.random.default_rng(seed)
+    shape = Shape.of(size)
+    cells = shape.cells
+    moves = SlidingPuzzle.MOVES
+    # neighbours[cell, k] is the cell the blank reaches with move k, -1 off the board
+    neighbours = np.array([[shape.moves[cell].get(move, -1) for move in moves] for cell in range(cells)], dtype=np.int64)
+    inverse = np.array([moves.index((-dr, -dc)) for dr, dc in moves])
+
+    boards = np.tile(np.array(shape.goal, dtype=np.uint8), (count, 1))
+    blanks = np.full(count, cells - 1, dtype=np.int64)
+    undo = np.full(count, -1, dtype=np.int64) # move undoing the last one
+    rows = np.arange(count)
+    for _ in range(depth):
+        targets = neighbours[blanks]
+        allowed = (targets >= 0) & (np.arange(len(moves)) != undo[:, None])
+        # the r-th allowed move of each board, r uniform below the number of allowed moves
+        r = (rng.random(count) * allowed.sum(axis=1)).astype(np.int64)
+        k = np.argmax(allowed & (np.cumsum(allowed, axis=1) == r[:, None] + 1), axis=1)
+        target = targets[rows, k]
+        boards[rows, blanks] = boards[rows, target]
+        boards[rows, target] = 0
+        blanks = target
+        undo = inverse[k]
+    return boards
+
+
+def pack(boards, size):
+    # 64-bit keys of a (count, cells) array of boards, equal to PackedState's boards (up to 16 cells)
+    bits = PackedState.layout(size)[0]
+    shape = Shape.of(size)
+    if bits * shape.cells > 64:
+        raise ValueError("%dx%d boards take %d bits, more than a 64-bit key" % (shape.rows, shape.cols, bits * shape.cells))
+    shifts = np.arange(shape.cells, dtype=np.uint64) * np.uint64(bits)
+    return np.bitwise_or.reduce(boards.astype(np.uint64) << shifts, axis=1)
+
+
+def unpack(keys, size):
+    bits, mask, _ = PackedState.layout(size)
+    shifts = np.arange(Shape.of(size).cells, dtype=np.uint64) * np.uint64(bits)
+    return ((np.asarray(keys, dtype=np.uint64)[:, None] >> shifts) & np.uint64(mask)).astype(np.uint8)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print random solvable boards, one per line, tiles in row order.")
+    parser.add_argument("size", type=parse_size, help="e.g. 4, or 3x5 for 3 rows and 5 columns")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--depth", type=int, default=None, help="random walks of this many moves instead of uniform boards")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    chunk = 1 << 16
+    for begin in range(0, args.count, chunk):
+        n = min(chunk, args.count - begin)
+        boards = random_boards(args.size, n, rng) if args.depth is None else random_walks(args.size, args.depth, n, rng)
+        sys.stdout.write("".join(" ".join(map(str, board)) + "\n" for board in boards.tolist()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
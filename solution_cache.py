@@ -0,0 +1,221 @@
+'''
+Cache of optimal solutions for the sliding tile puzzle, shared by every TreeSearch solver.
+
+Reflecting a board in its main diagonal (the cell at row r, column c goes to row c, column r, and each tile is renamed
+after the goal cell its own goal cell is reflected to) gives a board exactly as far from the goal, solved by the
+reflected moves: down becomes right and up becomes left. A board and its reflection are stored once, under the smaller of
+their packed keys (the canonical board). Rectangular boards reflect to another shape, they are stored as they are.
+
+Solutions are kept in memory up to a number of boards, the least recently used going first, and in an sqlite database
+when a path is given, so they survive between runs and are shared by the processes of a batch. Every board along an
+optimal solution is itself solved optimally by the rest of it, so storing a solution caches all of them:
+    cache = SolutionCache("solutions.db")
+    sequence = TreeSearch(board, cache=cache).IDA_star_inplace_solve()    # searched, then stored
+    sequence = TreeSearch(board, cache=cache).A_star_solve()              # found in the cache
+The exact distances of the cached boards can also be used as a heuristic, see ExactHeuristic.
+'''
+
+import sqlite3
+from collections import OrderedDict
+
+#local imports
+import heuristics
+from games import MOVE_CODES, PackedState, Shape, SlidingPuzzle, pack_moves, unpack_moves
+
+# reflected[k] is the index in SlidingPuzzle.MOVES of the reflection of move k
+REFLECTED_MOVES = [SlidingPuzzle.MOVES.index((dc, dr)) for dr, dc in SlidingPuzzle.MOVES]
+
+# square size -> (cells, labels): cell c of the reflected board holds the tile at cells[c] of the board, renamed to labels[tile]
+_reflections = {}
+
+
+def reflection(size):
+    if size not in _reflections:
+        cells = [(cell % size) * size + cell // size for cell in range(size * size)]
+        # tile t belongs at cell t - 1, the blank at the last cell, which is on the diagonal
+        labels = [0] + [cells[tile - 1] + 1 for tile in range(1, size * size)]
+        _reflections[size] = (cells, labels)
+    return _reflections[size]
+
+
+def reflect(tiles, size):
+    cells, labels = reflection(size)
+    return [labels[tiles[cell]] for cell in cells]
+
+
+def canonical(tiles, size):
+    # The packed key of the canonical board and whether it is the reflection of tiles
+    bits = PackedState.layout(size)[0]
+    key = PackedState.pack(tiles, bits)[0]
+    if not isinstance(size, int):
+        return key, False
+    reflected = PackedState.pack(reflect(tiles, size), bits)[0]
+    return (reflected, True) if reflected < key else (key, False)
+
+
+class ExactHeuristic:
+    '''
+    Heuristic using the exact distance of the boards in a SolutionCache's memory and another heuristic for the rest,
+    taking the larger of the two. Both never overestimate, so the searches stay optimal, and once a search reaches a board
+    on a cached solution every board along it has its exact distance, so the search follows it without branching.
+    Made by SolutionCache.heuristic.
+
+    Required arguments:
+    - base: the heuristic used for boards that are not cached (heuristics.Manhattan, a pattern database, ...)
+    - distances: dictionary of packed board -> exact distance for boards of the base heuristic's size, kept up to date by
+      the cache
+    '''
+    def __init__(self, base, distances):
+        self.base = base
+        self.distances = distances
+        self.size = base.size
+        self.bits = PackedState.layout(self.size)[0]
+        self.admissible = getattr(base, "admissible", True)
+
+    def __call__(self, state):
+        heuristic = self.base(state)
+        exact = self.distances.get(state.key())
+        return heuristic if exact is None else max(heuristic, exact)
+
+    def update(self, state, heuristic, tile, src, dst):
+        update = getattr(self.base, "update", None)
+        if update is not None and not self.distances:
+            return update(state, heuristic, tile, src, dst)
+        key = state.key()
+        if update is None or key in self.distances:
+            return None # the value before the move may not be the base heuristic's, the caller recomputes in full
+        heuristic = update(state, heuristic, tile, src, dst)
+        if heuristic is None:
+            return None
+        exact = self.distances.get(key - (tile << (src * self.bits)) + (tile << (dst * self.bits)))
+        return heuristic if exact is None else max(heuristic, exact)
+
+
+class SolutionCache:
+    '''
+    Optimal solutions of boards, keyed by canonical board.
+
+    Optional
+    - path: sqlite database the solutions are also written to (created if missing), None to keep them in memory only
+    - capacity: number of boards kept in memory, the least recently used are dropped first
+    - prune: also give the searches consulting the cache the exact distances of the boards in memory as a heuristic
+
+    attributes:
+    - hits, misses: lookups answered and not answered by the cache
+    - distances: exact distance of every board in memory and of its reflection, by size and then packed board
+
+    methods:
+    - get: optimal moves for a state, None if it is not cached
+    - distance: optimal solution length of a state, None if it is not cached
+    - put: stores an optimal solution of a state, along with the boards it passes through
+    - heuristic: wraps a heuristic so it uses the exact distances of the cached boards
+    - stats: dictionary of the counters above
+    - close: closes the database
+    '''
+    def __init__(self, path=None, capacity=100000, prune=False):
+        self.path = path
+        self.capacity = capacity
+        self.prune = prune
+        self.entries = OrderedDict() # (size, canonical key) -> (length, packed moves, packed reflection)
+        self.distances = {}
+        self.hits = self.misses = 0
+        self.db = None
+        if path is not None:
+            # the background solver of the UI may use the cache from another thread than the one that opened it
+            self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+            # shape is "4" for 4x4 boards and "2x4" for 2 rows of 4
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions (shape TEXT, board BLOB, length INTEGER, moves BLOB,"
+                            " PRIMARY KEY (shape, board)) WITHOUT ROWID")
+            self.db.commit()
+
+    def lookup(self, size, key):
+        # (length, packed moves) of a canonical board, from memory or the database
+        entry = self.entries.get((size, key))
+        if entry is not None:
+            self.entries.move_to_end((size, key))
+            return entry[:2]
+        if self.db is None:
+            return None
+        row = self.db.execute("SELECT length, moves FROM solutions WHERE shape = ? AND board = ?",
+                              (self.shape_name(size), self.board_bytes(size, key))).fetchone()
+        if row is None:
+            return None
+        self.remember(size, key, row[0], row[1])
+        return row
+
+    def remember(self, size, key, length, moves):
+        if (size, key) in self.entries:
+            self.entries.move_to_end((size, key))
+            return
+        reflected = key
+        if isinstance(size, int):
+            bits, mask, _ = PackedState.layout(size)
+            tiles = [(key >> (cell * bits)) & mask for cell in range(size * size)]
+            reflected = PackedState.pack(reflect(tiles, size), bits)[0]
+        self.entries[(size, key)] = (length, moves, reflected)
+        distances = self.distances.setdefault(size, {})
+        distances[key] = distances[reflected] = length
+        while len(self.entries) > self.capacity:
+            (old_size, old), (_, _, old_reflected) = self.entries.popitem(last=False)
+            self.distances[old_size].pop(old, None)
+            self.distances[old_size].pop(old_reflected, None)
+
+    @staticmethod
+    def board_bytes(size, key):
+        return key.to_bytes((PackedState.layout(size)[0] * Shape.of(size).cells + 7) // 8, "little")
+
+    @staticmethod
+    def shape_name(size):
+        shape = Shape.of(size)
+        return "%d" % shape.rows if shape.rows == shape.cols else "%dx%d" % (shape.rows, shape.cols)
+
+    def get(self, state):
+        size = state.size
+        key, reflected = canonical(state.tiles(), size)
+        entry = self.lookup(size, key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        codes = unpack_moves(entry[1], entry[0])
+        if reflected:
+            codes = [REFLECTED_MOVES[code] for code in codes]
+        return [SlidingPuzzle.MOVES[code] for code in codes]
+
+    def distance(self, state):
+        key, _ = canonical(state.tiles(), state.size)
+        entry = self.lookup(state.size, key)
+        return None if entry is None else entry[0]
+
+    def put(self, state, sequence):
+        # sequence must be an optimal solution of state, every board it passes through is stored with the rest of it
+        size = state.size
+        moves_from = Shape.of(size).moves
+        tiles = state.tiles()
+        codes = [MOVE_CODES[tuple(move)] for move in sequence]
+        rows = []
+        empty = tiles.index(0)
+        for i, code in enumerate(codes):
+            key, reflected = canonical(tiles, size)
+            rest = [REFLECTED_MOVES[c] for c in codes[i:]] if reflected else codes[i:]
+            moves = pack_moves(rest)
+            self.remember(size, key, len(rest), moves)
+            rows.append((self.shape_name(size), self.board_bytes(size, key), len(rest), moves))
+            target = moves_from[empty][SlidingPuzzle.MOVES[code]]
+            tiles[empty], tiles[target] = tiles[target], 0
+            empty = target
+        if self.db is not None and rows:
+            self.db.executemany("INSERT OR IGNORE INTO solutions VALUES (?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    def heuristic(self, base, size):
+        # base: a heuristic or None for Manhattan distance
+        return ExactHeuristic(base if base is not None else heuristics.Manhattan(size), self.distances.setdefault(size, {}))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "in_memory": len(self.entries)}
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
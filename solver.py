@@ -0,0 +1,89 @@
+'''
+Headless solver entry point: solves boards given on the command line, or runs as a long-lived worker answering boards
+read from stdin, one JSON line per board (the same results as batch.py, see there for the fields).
+
+The worker pays the interpreter start up, the imports and the heuristic tables once: the move and distance tables of the
+board shape and the named heuristic (pattern databases are memory mapped) are loaded before the first board is read when
+--shape is given, or with the first board of each size otherwise, then every board costs only its search. Boards are answered in input order as soon as each one is solved, so a
+scheduler can keep one worker open and feed it boards through a pipe:
+    $python solver.py "8 6 7 2 5 4 3 0 1"
+    $python solver.py --pdb 6-6-3 < boards.txt > results.jsonl
+    $python solver.py --shape 3x5 --algorithm astar-compact
+
+Nothing heavier than the solvers is imported unless asked for: batch.py (with multiprocessing and sqlite3) is only
+loaded to solve boards, --gui opens the pygame game and --plot runs the matplotlib shuffle plot of test.py.
+'''
+
+import argparse
+import json
+import runpy
+import sys
+
+#local imports
+import heuristics
+from games import Shape, parse_size
+from tree_search import SOLVERS, ANYTIME_SOLVERS, TIME_LIMIT
+
+
+def serve(lines, output=sys.stdout):
+    # Solves the board on each line as it arrives, skipping blank lines and comments; ids are the 1-based line numbers
+    import batch
+    for number, line in enumerate(lines, 1):
+        if not line.strip() or line.startswith("#"):
+            continue
+        # a bad line is answered with a "failed" result, the worker keeps serving the next ones
+        try:
+            result = batch.solve_board((number, line))
+        except Exception as e:
+            result = {"id": number, "board": line.strip(), "status": "failed", "error": "%s: %s" % (type(e).__name__, e)}
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve sliding tile boards headless, one JSON result per line.")
+    parser.add_argument("boards", nargs="*", metavar="BOARD",
+                        help="boards to solve, tiles in row order with 0 for the blank (default: read boards from stdin until it closes)")
+    parser.add_argument("--algorithm", choices=sorted(SOLVERS) + sorted(ANYTIME_SOLVERS), default="ida")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT, help="seconds allowed per board")
+    parser.add_argument("--heuristic", default=None, metavar="NAME",
+                        help="heuristic by name: %s, max:a,b, sum:a,b or pdb:PARTITION" % ", ".join(sorted(heuristics.HEURISTICS)))
+    parser.add_argument("--pdb", default=None, metavar="PARTITION", help="use an additive pattern database, e.g. 6-6-3")
+    parser.add_argument("--cache", default=None, metavar="PATH", help="sqlite database of solutions to reuse and extend")
+    parser.add_argument("--shape", type=parse_size, default=None, metavar="ROWSxCOLS",
+                        help="board shape, e.g. 3x5, its tables are loaded up front (default: square, loaded at the first board of each size)")
+    parser.add_argument("--pairs", action="store_true", help="report the moves as [row, col] pairs instead of a DURL string")
+    parser.add_argument("--gui", action="store_true", help="open the pygame game instead")
+    parser.add_argument("--plot", action="store_true", help="plot solve times against the number of shuffles instead")
+    args = parser.parse_args(argv)
+
+    if args.gui:
+        runpy.run_module("main", run_name="__main__")
+        return 0
+    if args.plot:
+        from test import plot_shuffles
+        plot_shuffles()
+        return 0
+
+    # the worker side of batch.py, imported only now as it brings multiprocessing and sqlite3 along
+    import batch
+    heuristic = "pdb:" + args.pdb if args.pdb else args.heuristic
+    batch.init_worker(args.algorithm, args.time_limit, heuristic, cache=args.cache, size=args.shape, pairs=args.pairs)
+    if args.boards:
+        serve(args.boards)
+        return 0
+    if args.shape is not None:
+        # tables of the given shape are built before the first board arrives, without it each size loads its own on its first board
+        try:
+            batch.load_heuristic(Shape.of(args.shape).size)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        serve(iter(sys.stdin.readline, ""))
+    except KeyboardInterrupt:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
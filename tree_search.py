@@ -1,76 +1,625 @@
+import functools
+import heapq
 import os
 import queue
+import threading
 import time
+from collections import deque
 import heapdict
 
+#local imports
+import heuristics
+
 # Constants
-TIME_LIMIT = 10 * 60 # seconds
+TIME_LIMIT = 10 * 60 # seconds, default per-solve time limit
+
+# Short names of the single process solvers, used by the command line tools
+SOLVERS = {
+    "bfs": "BFS_solve",
+    "bfs-bidirectional": "bidirectional_BFS_solve",
+    "bfs-batch": "BFS_batch_solve",
+    "bfs-external": "BFS_external_solve",
+    "astar": "A_star_solve",
+    "astar-compact": "A_star_compact_solve",
+    "astar-buckets": "A_star_bounded_solve",
+    "astar-bidirectional": "bidirectional_A_star_solve",
+    "ida": "IDA_star_inplace_solve",
+    "ida-recursive": "IDA_star_solve",
+}
+
+# Solvers trading optimality for speed, their solutions may be longer than optimal
+ANYTIME_SOLVERS = {
+    "beam": "beam_solve",
+    "anytime-astar": "anytime_A_star_solve",
+    "anytime-beam": "anytime_beam_solve",
+}
 
 def clear_console():
     os.system('cls' if os.name == 'nt' else 'clear')
 
+class TranspositionTable:
+    '''
+    Fixed size transposition table for IDA*, one entry per slot, indexed by the state's key (its packed board) modulo the
+    size. An entry records that a state was searched at path cost g, without the move undoing the one that reached it,
+    and that every path below it was cut off by the bound, with exceed the smallest f above it. A later visit is skipped
+    when it reaches the state at a higher cost (or the same cost in the same iteration), or when it repeats the same
+    search and exceed is still above the bound.
+    Optional:
+    - size: number of entries, each about 100 bytes; a prime spreads the packed boards over the slots best
+    - policy: which entry a full slot keeps, "always" replaces it with the newest entry and "depth" keeps an entry of the
+      current iteration closer to the start (its subtree saves more work)
+    attributes:
+    - probes, hits: lookups made and lookups that skipped a subtree
+    - stores, replaced: entries written and entries of other states overwritten
+    '''
+    POLICIES = ("always", "depth")
+
+    def __init__(self, size=262139, policy="always"):
+        if policy not in self.POLICIES:
+            raise ValueError("Unknown replacement policy %r, expected one of %s" % (policy, ", ".join(self.POLICIES)))
+        self.size = size
+        self.policy = policy
+        self.clear()
+
+    def clear(self):
+        self.slots = [None] * self.size # (key, g, undo, exceed, bound) or None
+        self.probes = self.hits = self.stores = self.replaced = 0
+
+    # Returns the f to report instead of searching the state again, or None if it has to be searched
+    def lookup(self, key, g, undo, bound):
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is None or entry[0] != key:
+            return None
+        if entry[1] < g or (entry[1] == g and entry[4] == bound):
+            # reached more cheaply elsewhere, that visit covers everything below this one
+            self.hits += 1
+            return float('inf')
+        if entry[1] == g and entry[2] == undo and entry[3] > bound:
+            # the same search already ended above the bound
+            self.hits += 1
+            return entry[3]
+        return None
+
+    def store(self, key, g, undo, exceed, bound):
+        slot = key % self.size
+        entry = self.slots[slot]
+        if entry is not None and entry[0] != key:
+            if self.policy == "depth" and entry[4] == bound and entry[1] < g:
+                return
+            self.replaced += 1
+        self.slots[slot] = (key, g, undo, exceed, bound)
+        self.stores += 1
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "policy": self.policy,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "replaced": self.replaced,
+            "filled": self.size - self.slots.count(None),
+        }
+
+def cached(optimal):
+    # Solvers consult the TreeSearch's solution cache before searching and store the optimal solutions they find in it.
+    # optimal says whether the solver always returns a shortest solution; the others (anytime and beam solvers) only
+    # store a solution once it is proven optimal. Nothing found with a heuristic that may overestimate (e.g. "sum:...")
+    # is stored, it may be longer than optimal.
+    def decorator(solver):
+        @functools.wraps(solver)
+        def solve(self, *args, **kwargs):
+            self.cache_hit = False
+            if self.cache is None:
+                return solver(self, *args, **kwargs)
+            sequence = self.cache.get(self.initial_state)
+            if sequence is not None:
+                self.timer = time.time()
+                self.visit_counter = 0
+                self.start_metrics("Cache")
+                self.status = None
+                self.cache_hit = True
+                if not optimal:
+                    self.best, self.suboptimality = sequence, 1.0
+                self.timer = time.time() - self.timer
+                return sequence
+            sequence = solver(self, *args, **kwargs)
+            admissible = getattr(self.initial_state.heuristic_fn, "admissible", True)
+            if sequence and self.timer is not None and admissible and (optimal or self.suboptimality == 1.0):
+                self.cache.put(self.initial_state, sequence)
+            return sequence
+        return solve
+    return decorator
+
 class TreeSearch:
     '''
     TreeSearch class for the sliding tile puzzle: Needed to solve the puzzle using BFS, A*, and IDA*.
     Required:
-    - initial_state: the initial state of the puzzle
-    - goal_test: a function that returns True if the current state is the goal state
-    - successor_function: a function that returns a list of possible moves from the current state
-    - heuristic: a function that returns the estimated cost of the path from the current state to the goal state (if applicable)
+    - initial_state: the initial state of the puzzle, which provides the goal test (goal_test) and the successor
+      function (generate_legal_successors) the solvers use
+    Optional
+    - heuristic: a function that returns the estimated cost of the path from the current state to the goal state, or the
+      name of one from the heuristics registry, e.g. "linear_conflict", "max:linear_conflict,walking_distance" or
+      "pdb:6-6-3"; defaults to the state's own heuristic (Manhattan distance)
+    - time_limit: seconds a single solve may run before giving up (defaults to TIME_LIMIT)
+    - hooks: list of functions hook(event, stats) called with the dictionary from stats() on "progress" every report_every
+      expansions and on "iteration" each time IDA* raises its bound, e.g. [console_progress]
+    - report_every: number of expansions between "progress" events
+    - cache: a solution_cache.SolutionCache, every solver returns the cached solution of the initial state if there is one
+      and stores the optimal solutions it finds; with the cache's prune option the exact distances of the cached boards
+      also strengthen the heuristic
+
+    Without hooks the solvers only pay one integer comparison per expansion for the instrumentation.
     '''
 
     
 
-    #To initialize the class, you need to pass the initial state of the puzzle, the goal test function, the successor function, and the heuristic function (if applicable)
-    def __init__(self, initial_state):
+    #To initialize the class, you need to pass the initial state of the puzzle and the heuristic (if applicable)
+    def __init__(self, initial_state, heuristic=None, time_limit=TIME_LIMIT, hooks=None, report_every=10000, cache=None):
         # initialize state object implemented in game
         self.initial_state = initial_state
+
+        # plug the heuristic into the initial state, successors inherit it
+        if heuristic is not None:
+            initial_state.heuristic_fn = heuristics.get_heuristic(heuristic, initial_state.size)
+            initial_state.calc_heuristic()
+            initial_state.eval = initial_state.path_cost + initial_state.heuristic
+
+        self.cache = cache
+        self.cache_hit = False # whether the last solve was answered by the cache
+        if cache is not None and cache.prune:
+            initial_state.heuristic_fn = cache.heuristic(initial_state.heuristic_fn, initial_state.size)
+            initial_state.calc_heuristic()
+            initial_state.eval = initial_state.path_cost + initial_state.heuristic
         
+        self.time_limit = time_limit
+
+        # optional function returning True when the search should be abandoned, checked periodically
+        self.should_stop = None
+
         # initialize metric variables
         self.timer = 0
         self.visit_counter = 0
         self.bound = 0
+        self.worker_counters = {} # nodes expanded per worker process in the parallel solver
+        self.status = None # "UNSOLVABLE" when the last solve was refused by the solvability check
+        self.peak_nodes = 0 # most states held in memory at once by the memory-bounded A*
+        self.forgotten = 0 # states dropped to stay within the memory budget
+        self.table = None # TranspositionTable of the last in place IDA* solve, if it used one
 
-    def BFS_solve(self):
+        # instrumentation
+        self.hooks = list(hooks) if hooks else []
+        self.report_every = report_every
+        self.sample_every = 64 # expansions between heuristic samples when hooks are set
+        self.start_metrics(None)
+
+    def check_solvable(self):
+        # Called by every solver before searching: a board with the wrong parity would otherwise be searched until the
+        # time limit. States without an is_solvable method are assumed solvable.
+        is_solvable = getattr(self.initial_state, "is_solvable", None)
+        if is_solvable is not None and not is_solvable():
+            print("ERROR: Board is unsolvable.")
+            self.status = "UNSOLVABLE"
+            self.timer = 0
+            return False
+        self.status = None
+        return True
+
+    def estimate(self):
+        # Lower bounds on the solution length, cheap enough to compute before deciding how (or whether) to solve
+        return self.initial_state.lower_bounds()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start_metrics(self, algorithm):
+        # Resets the instrumentation counters at the start of a solve
+        self.algorithm = algorithm
+        self.start_time = time.time()
+        self.generated = 0 # states created by successor generation (or moves applied in place)
+        self.duplicates = 0 # generated states discarded because they were already reached
+        self.frontier_size = 0
+        self.heuristic_histogram = {} # sampled heuristic values of expanded states -> count
+        self.nodes_per_sec = 0.0
+        self.best = None # best solution of an anytime solve
+        self.solutions = [] # (seconds, length, suboptimality) of every improvement an anytime solve found
+        self.suboptimality = None # proven bound on the best length over the optimal length, set by anytime solves
+        self.sample_time = self.start_time
+        self.sample_count = 0
+        self.next_report = self.report_every
+        # solvers call instrument() once visit_counter reaches next_check, which never happens without hooks
+        self.next_check = self.sample_every if self.hooks else float('inf')
+
+    def instrument(self, state, frontier_size):
+        self.sample(state.heuristic, frontier_size)
+
+    def sample(self, h, frontier_size):
+        # instrument() for solvers that keep packed boards instead of states, given the heuristic of the expanded board
+        self.next_check = self.visit_counter + self.sample_every
+        self.frontier_size = frontier_size
+        self.heuristic_histogram[h] = self.heuristic_histogram.get(h, 0) + 1
+        if self.visit_counter >= self.next_report:
+            self.next_report = self.visit_counter + self.report_every
+            now = time.time()
+            self.nodes_per_sec = (self.visit_counter - self.sample_count) / max(now - self.sample_time, 1e-9)
+            self.sample_time, self.sample_count = now, self.visit_counter
+            self.fire("progress")
+
+    def fire(self, event):
+        if self.hooks:
+            stats = self.stats()
+            for hook in self.hooks:
+                hook(event, stats)
+
+    def stats(self):
+        return {
+            "algorithm": self.algorithm,
+            "expanded": self.visit_counter,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "frontier": self.frontier_size,
+            "bound": self.bound,
+            "elapsed": time.time() - self.start_time,
+            "nodes_per_sec": self.nodes_per_sec,
+            "heuristic_histogram": dict(self.heuristic_histogram),
+            "table": self.table.stats() if self.table is not None else None,
+            "suboptimality": self.suboptimality,
+            "solution_length": len(self.best) if self.best is not None else None,
+        }
+
+    # Layered breadth first search. States are marked visited when they are generated, so each one is queued once, and
+    # the goal is caught as soon as it is generated. With frontier_sets=True only the packed keys of the previous, current
+    # and next layers are kept instead of every visited state: when every move can be undone, a successor of layer d is
+    # in layer d - 1, d or d + 1. This only drops the visited set, a constant factor (about 76MB down to 48MB on 3x3):
+    # every queued state still keeps its whole parent chain alive, so memory still grows with the whole search.
+    @cached(optimal=True)
+    def BFS_solve(self, frontier_sets=False):
         sequence = []
-        visited = set()
-        frontier = []
-        frontier.append(self.initial_state)
+        start = self.initial_state
 
         self.visit_counter = 0
         self.timer = time.time()
+        self.start_metrics("BFS")
+        if not self.check_solvable():
+            return []
+
+        if start.goal_test():
+            self.timer = time.time() - self.timer
+            return sequence
+
+        layer = [start]
+        if frontier_sets:
+            previous, current = set(), {start.key()}
+        else:
+            visited = {start}
+
+        while layer:
+            next_layer = []
+            upcoming = set()
+            for state in layer:
+                self.visit_counter += 1
+
+                #termination condition: time limit exceeded or search abandoned
+                if time.time() - self.timer > self.time_limit:
+                    print("BFS ERROR: Time limit exceeded.")
+                    self.timer = None
+                    return sequence
+                if self.should_stop is not None and self.should_stop():
+                    return sequence
+
+                # progress reporting, see console_progress for the console output
+                if self.visit_counter >= self.next_check:
+                    self.instrument(state, len(layer) + len(next_layer))
+
+                for new_state in state.generate_legal_successors():
+                    self.generated += 1
+                    if frontier_sets:
+                        key = new_state.key()
+                        if key in previous or key in current or key in upcoming:
+                            self.duplicates += 1
+                            continue
+                        upcoming.add(key)
+                    else:
+                        if new_state in visited:
+                            self.duplicates += 1
+                            continue
+                        visited.add(new_state)
+
+                    if new_state.goal_test():
+                        self.timer = time.time() - self.timer
+                        while new_state.parent is not None:
+                            sequence.append(new_state.action)
+                            new_state = new_state.parent
+                        sequence.reverse()
+                        return sequence
+                    next_layer.append(new_state)
+
+            layer = next_layer
+            if frontier_sets:
+                previous, current = current, upcoming
+        return sequence
+
+    # Layered BFS on the numpy batch engine (frontier.py): each layer is expanded as a whole and deduplicated against itself
+    # and the layer before the one it came from. The moves of a sliding puzzle alternate the blank's color on a checkerboard,
+    # so a successor of layer d is always in layer d - 1 or d + 1 and older layers can be dropped, keeping only the parent
+    # indices and moves needed to read the solution back.
+    @cached(optimal=True)
+    def BFS_batch_solve(self):
+        from frontier import BatchEngine
+
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("BFS batch")
+        if not self.check_solvable():
+            return []
+
+        engine = BatchEngine(self.initial_state.size)
+        layer = engine.layer(self.initial_state, evaluate=False)
+        if len(engine.goals(layer)):
+            self.timer = time.time() - self.timer
+            return []
+        history = [] # (parents, moves) of every layer after the start
+        previous = None # keys of the layer before the one being expanded
+        while len(layer):
+            stop = self.check_layer_limits("BFS", len(layer))
+            if stop:
+                return []
+            children = engine.expand(layer, evaluate=False)
+            generated = len(children)
+            children = engine.unique(children, previous)
+            self.generated += generated
+            self.duplicates += generated - len(children)
+            self.visit_counter += len(layer)
+            history.append((children.parents, children.moves))
+            goals = engine.goals(children)
+            if len(goals):
+                self.timer = time.time() - self.timer
+                return engine.path(history, goals[0])
+            previous = layer.keys
+            layer = children
+        return []
+
+    # Breadth first search with its layers on disk (external_bfs.py), for searches whose visited set does not fit in
+    # memory. The layers go to directory (a temporary directory by default, removed afterwards) and the solution is read
+    # back through them, each step going to a neighbour found in the layer before.
+    @cached(optimal=True)
+    def BFS_external_solve(self, directory=None):
+        import shutil
+        import tempfile
+        from external_bfs import ExternalBFS
+
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("BFS external")
+        if not self.check_solvable():
+            return []
+
+        temporary = directory is None
+        directory = tempfile.mkdtemp(prefix="bfs_") if temporary else directory
+        try:
+            bfs = ExternalBFS(self.initial_state.size, directory, self.initial_state.tiles())
+            goal = self.initial_state.goal_state().tiles()
+
+            def check():
+                return self.check_layer_limits("BFS", bfs.histogram[-1])
+
+            def report(depth, count):
+                self.bound = depth
+                self.visit_counter += bfs.histogram[depth - 1]
+
+            depth = bfs.run(target=goal, check=check, report=report)
+            if depth is None or isinstance(depth, str): # no path, ERROR or STOPPED
+                return []
+            self.timer = time.time() - self.timer
+            return bfs.path(goal, depth)
+        finally:
+            if temporary:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    # Beam search on the batch engine: every layer is cut down to the width boards with the lowest heuristic. It expands
+    # at most width boards per move, so it is fast and bounded in memory, but the solution is usually longer than optimal
+    # and a beam too narrow can lose every path to the goal. Uses the initial state's heuristic: Manhattan distance and
+    # pattern databases are evaluated for the whole layer at once, other heuristics board by board, which is much slower.
+    @cached(optimal=False)
+    def beam_solve(self, width=10000, max_depth=1000):
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("Beam search")
+        if not self.check_solvable():
+            return []
+
+        t = self.beam_search(width, max_depth)
+        if t is None or isinstance(t, str): # no solution, ERROR or STOPPED
+            return []
+        self.timer = time.time() - self.timer
+        return t
+
+    # Returns the solution, None if the beam found none within max_depth moves, or ERROR, STOPPED or DEADLINE
+    def beam_search(self, width, max_depth, deadline=None):
+        from frontier import BatchEngine
+
+        engine = BatchEngine(self.initial_state.size, self.initial_state.heuristic_fn)
+        layer = engine.layer(self.initial_state)
+        if len(engine.goals(layer)):
+            return []
+        history = []
+        previous = None
+        for depth in range(max_depth):
+            self.bound = depth
+            stop = self.check_layer_limits("Beam search", len(layer), deadline)
+            if stop:
+                return stop
+            children = engine.expand(layer)
+            generated = len(children)
+            children = engine.unique(children, previous)
+            self.generated += generated
+            self.duplicates += generated - len(children)
+            self.visit_counter += len(layer)
+            goals = engine.goals(children)
+            if len(goals):
+                return engine.path(history + [(children.parents, children.moves)], goals[0])
+            children = engine.best(children, width)
+            history.append((children.parents, children.moves))
+            previous = layer.keys
+            layer = children
+        return None
+
+    def check_layer_limits(self, name, frontier_size, deadline=None):
+        # Limits and progress of the batch solvers, checked once per layer. Past a deadline (anytime solvers) the search
+        # stops quietly, the time limit is an error.
+        if deadline is not None:
+            if time.time() > deadline:
+                return "DEADLINE"
+        elif time.time() - self.timer > self.time_limit:
+            print(name, "ERROR: Time limit exceeded.")
+            self.timer = None
+            return "ERROR"
+        if self.should_stop is not None and self.should_stop():
+            return "STOPPED"
+        self.frontier_size = frontier_size
+        if self.hooks:
+            now = time.time()
+            self.nodes_per_sec = (self.visit_counter - self.sample_count) / max(now - self.sample_time, 1e-9)
+            self.sample_time, self.sample_count = now, self.visit_counter
+            self.fire("progress")
+        return None
+
+    # Anytime weighted A* (restarting weighted A*): a weighted A* search with f = g + weight * h runs for each weight of the
+    # schedule in turn. Each run finds a solution at most weight times longer than optimal, usually far faster than A*,
+    # and only keeps paths shorter than the best solution so far; a run that ends without finding one proves it optimal.
+    # Returns the best solution when the schedule ends or the deadline (seconds, time_limit by default) passes, with a
+    # proven bound on its length over the optimal length in self.suboptimality (1.0 when optimal). Every improvement fires
+    # a "solution" event, so hooks can use the current best solution while the search goes on.
+    @cached(optimal=False)
+    def anytime_A_star_solve(self, weights=(5, 3, 2, 1.5, 1.25, 1), deadline=None):
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("Anytime A*")
+        if not self.check_solvable():
+            return []
+
+        deadline = self.timer + (self.time_limit if deadline is None else deadline)
+        self.start_anytime()
+        for weight in weights:
+            t = self.weighted_A_star_search(weight, deadline)
+            if isinstance(t, str) or self.suboptimality == 1.0: # DEADLINE or STOPPED, or nothing left to improve
+                break
+        return self.finish_anytime("Anytime A*", t)
+
+    # Anytime beam search: beam searches of growing width, each one only looking for a solution shorter than the best so
+    # far. A wider beam is slower but finds shorter solutions. self.suboptimality compares the best solution with the
+    # lower bounds of the initial state, a beam search cannot prove more.
+    @cached(optimal=False)
+    def anytime_beam_solve(self, widths=(100, 1000, 10000, 100000), deadline=None):
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("Anytime beam search")
+        if not self.check_solvable():
+            return []
+
+        deadline = self.timer + (self.time_limit if deadline is None else deadline)
+        self.start_anytime()
+        t = None
+        for width in widths:
+            t = self.beam_search(width, len(self.best) - 1 if self.best is not None else 1000, deadline)
+            if isinstance(t, str):
+                break
+            if t is not None:
+                self.record_solution(t)
+            if self.suboptimality == 1.0:
+                break
+        return self.finish_anytime("Anytime beam search", t)
 
+    # Returns the solution found, None if the run ended without a shorter one, or DEADLINE or STOPPED
+    def weighted_A_star_search(self, weight, deadline):
+        start = self.initial_state
+        limit = len(self.best) if self.best is not None else float('inf')
+        counter = 0 # tie breaker, states are never compared
+        frontier = [(weight * start.heuristic, start.heuristic, counter, start)]
+        best_g = {start: 0}
         while frontier:
-            state = frontier.pop(0)
-            visited.add(state)
+            _, h, _, state = heapq.heappop(frontier)
+            g = state.path_cost - start.path_cost
+            if g > best_g[state]:
+                continue # a shorter path to it was queued since
             self.visit_counter += 1
 
-            #termination condition: time limit exceeded
-            if (time.time() - self.timer) // 1 > TIME_LIMIT: # 5 minute time limit
-                print("BFS ERROR: Time limit exceeded.")
-                self.timer = None
-                return sequence
-
-            '''
-            Console output for debugging
-            clear_console()
-            print("BFS solving...")
-            print("Visited: ", visit_counter)
-            print("Time: ", (time.time() - timer) // 1, " seconds")
-            print("Visited/Time: ", visit_counter / (time.time() - timer))
-            '''
             if state.goal_test():
-                self.timer = time.time() - self.timer
-                while (state.parent != None):
+                sequence = []
+                while state is not start:
                     sequence.append(state.action)
                     state = state.parent
                 sequence.reverse()
+                self.record_solution(sequence)
+                self.raise_lower_bound(len(sequence) / weight, frontier, limit)
                 return sequence
+
+            #termination condition: deadline passed or search abandoned
+            if self.visit_counter & 1023 == 0:
+                stop = "DEADLINE" if time.time() > deadline else "STOPPED" if self.should_stop is not None and self.should_stop() else None
+                if stop:
+                    self.raise_lower_bound(0, frontier, limit)
+                    return stop
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(frontier))
+
             for new_state in state.generate_legal_successors():
-                if new_state not in visited:
-                    frontier.append(new_state)
-        return sequence;
-    
+                self.generated += 1
+                new_g = g + 1
+                if new_g + new_state.heuristic >= limit:
+                    continue # cannot beat the best solution so far
+                if new_g >= best_g.get(new_state, float('inf')):
+                    self.duplicates += 1
+                    continue
+                best_g[new_state] = new_g
+                counter += 1
+                heapq.heappush(frontier, (new_g + weight * new_state.heuristic, new_state.heuristic, counter, new_state))
+
+        # nothing shorter than the best solution exists
+        self.raise_lower_bound(limit, frontier, limit)
+        return None
+
+    def start_anytime(self):
+        self.suboptimality = float('inf')
+        # lower bounds on the solution length known before searching
+        self.lower_bound = self.initial_state.heuristic
+        lower_bounds = getattr(self.initial_state, "lower_bounds", None)
+        if lower_bounds is not None:
+            self.lower_bound = max([self.lower_bound] + list(lower_bounds().values()))
+
+    def record_solution(self, sequence):
+        if self.best is not None and len(sequence) >= len(self.best):
+            return
+        self.best = sequence
+        self.raise_lower_bound(0)
+        self.solutions.append((time.time() - self.timer, len(sequence), self.suboptimality))
+        self.fire("solution")
+
+    def raise_lower_bound(self, lower_bound, frontier=None, limit=float('inf')):
+        # With an admissible heuristic every path shorter than limit still goes through a queued state, so the smallest
+        # g + h on the open list is a lower bound on the optimal length too
+        if frontier is not None:
+            start = self.initial_state.path_cost
+            lower_bound = max(lower_bound, min([limit] + [state.path_cost - start + state.heuristic for *_, state in frontier]))
+        self.lower_bound = max(self.lower_bound, lower_bound)
+        if self.best is not None:
+            self.suboptimality = len(self.best) / self.lower_bound if self.lower_bound else 1.0
+            self.suboptimality = max(self.suboptimality, 1.0)
+
+    def finish_anytime(self, name, stop):
+        if self.best is None:
+            if stop != "STOPPED":
+                print(name, "ERROR: No solution found before the deadline.")
+            self.timer = None
+            return []
+        self.timer = time.time() - self.timer
+        return self.best
+
+    @cached(optimal=True)
     def A_star_solve(self):
         sequence = []
         visited = {}
@@ -79,6 +628,9 @@ class TreeSearch:
         visited[self.initial_state] = 0
         self.visit_counter = 0
         self.timer = time.time()
+        self.start_metrics("A*")
+        if not self.check_solvable():
+            return []
 
         while frontier:
             state, eval = frontier.popitem()
@@ -92,33 +644,489 @@ class TreeSearch:
                 sequence.reverse()
                 return sequence
 
-            #termination condition: time limit exceeded
-            if (time.time() - self.timer) // 1 > TIME_LIMIT: 
+            #termination condition: time limit exceeded or search abandoned
+            if time.time() - self.timer > self.time_limit:
                 print("A* ERROR: Time limit exceeded.")
                 self.timer = None
                 return sequence
+            if self.should_stop is not None and self.should_stop():
+                return sequence
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(frontier))
 
-            '''
-            Console output for debugging
-            clear_console()
-            print("A* solving...")
-            print("Visited: ", visit_counter)
-            print("Time final: ", (time.time() - timer) // 1, " seconds")
-            print("Avg heuristic: ", sum(heuristics) / len(heuristics))
-            print("Min heuristic: ", min(heuristics))
-            print("Max heuristic: ", max(heuristics))
-            '''
-                
             for new_state in state.generate_legal_successors():
+                self.generated += 1
                 new_priority = new_state.eval
                 # Handle the case where the new state is either not visited or the evaluation is less than that of the visited state
                 # This has to be different from the BFS solution because our visited set is now a dictionary with evals
                 if new_state not in visited or new_priority < visited[new_state]:
                     frontier[new_state] = new_priority
                     visited[new_state] = new_priority
+                else:
+                    self.duplicates += 1
+        return sequence
+
+    # A* storing integers instead of States. A node is its packed board (as in games.PackedState) and blank cell; the open
+    # list holds one integer per entry (f, g, board and blank packed together) and the visited table maps each board to
+    # its best g and the 2-bit code of the move that reached it. No parent or grid is kept: the solution is rebuilt from
+    # the goal by undoing the stored moves, each one leading to the previous board's entry. This takes several times less
+    # memory per node than A_star_solve and finds solutions of the same length.
+    @cached(optimal=True)
+    def A_star_compact_solve(self):
+        from games import MOVE_CODES, PackedState, Shape, updated_heuristic
+
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("A* compact")
+        if not self.check_solvable():
+            return []
+
+        start = self.initial_state
+        shape = Shape.of(start.size)
+        bits, mask, goal = PackedState.layout(shape.size)
+        board, empty = PackedState.pack(start.tiles(), bits)
+        # (move code, target cell) of every legal move of the blank at each cell
+        moves = [[(MOVE_CODES[move], target) for move, target in shape.moves[cell].items()] for cell in range(shape.cells)]
+        inverse = [MOVE_CODES[(-dr, -dc)] for dr, dc in MOVE_CODES]
+        distance = shape.distance
+        heuristic_fn = start.heuristic_fn
+
+        # an open entry is ((f << G_BITS | G_MAX - g) << board_bits | board) << blank_bits | blank, so the heap pops the
+        # lowest f first and the deepest of equal f
+        blank_bits = shape.cells.bit_length()
+        board_bits = bits * shape.cells
+        G_BITS, G_MAX = 12, (1 << 12) - 1
+        low_bits = board_bits + blank_bits
+        ROOT = 4 # move code of the initial state
+
+        visited = {board: ROOT} # board -> g << 3 | code of the move that reached it
+        frontier = [(start.heuristic << G_BITS | G_MAX) << low_bits | board << blank_bits | empty]
+
+        while frontier:
+            entry = heapq.heappop(frontier)
+            empty = entry & ((1 << blank_bits) - 1)
+            board = (entry >> blank_bits) & ((1 << board_bits) - 1)
+            g = G_MAX - ((entry >> low_bits) & G_MAX)
+            h = (entry >> (low_bits + G_BITS)) - g
+            stored = visited[board]
+            if stored >> 3 < g:
+                continue # reached more cheaply since this entry was queued
+            self.visit_counter += 1
+
+            if board == goal:
+                self.timer = time.time() - self.timer
+                return self.rebuild_path(visited, board, empty, shape, bits, mask)
+
+            #termination condition: time limit exceeded or search abandoned
+            if time.time() - self.timer > self.time_limit:
+                print("A* ERROR: Time limit exceeded.")
+                self.timer = None
+                return []
+            if self.should_stop is not None and self.should_stop():
+                return []
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.sample(h, len(frontier))
+
+            parent = None
+            undo = inverse[stored & 7] if stored & 7 != ROOT else None
+            for code, target in moves[empty]:
+                if code == undo:
+                    continue
+                self.generated += 1
+                tile = (board >> (target * bits)) & mask
+                child = board - (tile << (target * bits)) + (tile << (empty * bits))
+                old = visited.get(child)
+                if old is not None and old >> 3 <= g + 1:
+                    self.duplicates += 1
+                    continue
+                if heuristic_fn is None:
+                    child_h = h + distance[tile][empty] - distance[tile][target]
+                else:
+                    # pluggable heuristics are given the parent as a PackedState, built once per expansion
+                    if parent is None:
+                        parent = PackedState(shape.size, heuristic_fn=heuristic_fn, board=board, empty=empty)
+                    child_h = updated_heuristic(parent, tile, target, empty)
+                    if child_h is None:
+                        child_h = PackedState(shape.size, heuristic_fn=heuristic_fn, board=child, empty=target).heuristic
+                visited[child] = (g + 1) << 3 | code
+                heapq.heappush(frontier, ((g + 1 + child_h) << G_BITS | G_MAX - g - 1) << low_bits | child << blank_bits | target)
+        return []
+
+    @staticmethod
+    def rebuild_path(visited, board, empty, shape, bits, mask):
+        # Follows the move codes stored in visited back from board to the initial state (code 4)
+        from games import SlidingPuzzle
+        codes = []
+        while visited[board] & 7 != 4:
+            code = visited[board] & 7
+            codes.append(code)
+            dr, dc = SlidingPuzzle.MOVES[code]
+            previous = shape.moves[empty][(-dr, -dc)] # the blank's cell before the move
+            tile = (board >> (previous * bits)) & mask
+            board = board - (tile << (previous * bits)) + (tile << (empty * bits))
+            empty = previous
+        codes.reverse()
+        return [SlidingPuzzle.MOVES[code] for code in codes]
+
+    # A* with an open list of buckets indexed by the (small, integer) f value instead of a heap, and an optional memory
+    # budget of max_nodes stored states. When the budget is exceeded the worst open leaves are forgotten SMA*-style:
+    # their f is backed up into their parent, which goes back on the open list so the forgotten paths can be regenerated,
+    # and remembers it for each forgotten child so a regenerated child keeps what was learned about it. Stored nodes are
+    # the open leaves plus the closed states on the paths to them. Under a budget, a state whose path and successors do
+    # not fit in it, or whose successors are all stored on other paths, is a dead end: it is dropped with an infinite f.
+    # The search fails instead of thrashing until the time limit once the initial state is a dead end, or once the lowest
+    # f, a lower bound of the solution length, leaves no room in the budget for the solution path.
+    @cached(optimal=True)
+    def A_star_bounded_solve(self, max_nodes=None):
+        sequence = []
+        root = self.initial_state
+        stored = {root: root}   # every state in memory, mapped to its node (the one with the best known path)
+        children = {root: 0}    # number of stored children of each stored state
+        backed_up = {}          # f of the forgotten children of each stored state, by the move reaching them
+        opened = {root: root.eval} # states currently on the open list, mapped to their f
+        buckets = []            # buckets[f] holds open states with that f, stale entries are skipped when popped
+        self.add_to_bucket(buckets, root.eval, root)
+        min_f = root.eval
+
+        # reset relevant metric variables
+        self.timer = time.time()
+        self.visit_counter = 0
+        self.peak_nodes = 1
+        self.forgotten = 0
+        self.start_metrics("A* bounded")
+        if not self.check_solvable():
+            return []
+
+        while opened:
+            # pop the most recently added state of the lowest non-empty bucket
+            state = None
+            while min_f < len(buckets):
+                bucket = buckets[min_f]
+                while bucket:
+                    candidate = bucket.pop()
+                    if opened.get(candidate) == min_f and stored.get(candidate) is candidate:
+                        state = candidate
+                        break
+                if state is not None:
+                    break
+                min_f += 1
+            if state is None:
+                break
+            del opened[state]
+            f = min_f
+            if max_nodes is not None and f >= max_nodes:
+                break # f is a lower bound of the solution length, and its path alone needs f + 1 stored states
+            remembered = backed_up.pop(state, {})
+            self.visit_counter += 1
+
+            if state.goal_test():
+                self.timer = time.time() - self.timer
+                while state.parent is not None:
+                    sequence.append(state.action)
+                    state = state.parent
+                sequence.reverse()
+                return sequence
+
+            #termination condition: time limit exceeded or search abandoned
+            if time.time() - self.timer > self.time_limit:
+                print("A* ERROR: Time limit exceeded.")
+                self.timer = None
+                return sequence
+            if self.should_stop is not None and self.should_stop():
+                return sequence
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(opened))
+
+            successors = state.generate_legal_successors()
+            if max_nodes is not None and state.path_cost - root.path_cost + len(successors) > max_nodes:
+                successors = [] # the path and the successors (less the parent) cannot be stored together
+            for new_state in successors:
+                self.generated += 1
+                # a child's f is never below its parent's (possibly backed up) f, nor below what its forgotten subtree had
+                child_f = max(new_state.eval, f, remembered.get(new_state.action, 0))
+                if child_f == float('inf'):
+                    continue # a dead end
+                old = stored.get(new_state)
+                if old is not None:
+                    if old.path_cost <= new_state.path_cost:
+                        self.duplicates += 1
+                        continue
+                    # better path to a stored state: replace the old node
+                    self.unlink(old, stored, children)
+                    del stored[old]
+                    opened.pop(old, None)
+                    backed_up.pop(old, None) # learned on the longer path, it would overestimate on the new one
+                    parent = old.parent
+                    if max_nodes is not None and parent is not None and stored.get(parent) is parent:
+                        # the old parent's move there is now a dead end, and so is the old parent if it has nothing left
+                        backed_up.setdefault(parent, {})[old.action] = float('inf')
+                        if children[parent] == 0 and parent not in opened:
+                            self.drop_dead_end(parent, root, stored, children, backed_up, opened)
+                stored[new_state] = new_state
+                children[new_state] = 0
+                children[state] += 1
+                opened[new_state] = child_f
+                self.add_to_bucket(buckets, child_f, new_state)
+
+            if max_nodes is not None and children[state] == 0 and self.drop_dead_end(state, root, stored, children, backed_up, opened):
+                break
+            if max_nodes is not None and len(stored) > max_nodes:
+                # forget a little more than needed so the open list is not rescanned on every expansion
+                count = len(stored) - max_nodes + max_nodes // 100
+                min_f = self.forget_worst(buckets, count, root, stored, children, backed_up, opened, min_f)
+                if len(stored) > max_nodes:
+                    break # no open leaf left to forget
+            if len(stored) > self.peak_nodes:
+                self.peak_nodes = len(stored)
+        if max_nodes is not None:
+            print("A* ERROR: No solution within %d stored states." % max_nodes)
+            self.timer = time.time() - self.timer
+        return sequence
+
+    @staticmethod
+    def add_to_bucket(buckets, f, state):
+        while len(buckets) <= f:
+            buckets.append(deque())
+        buckets[f].append(state)
+
+    @staticmethod
+    def unlink(node, stored, children):
+        # drop node from its parent's child count, if the parent is still stored
+        parent = node.parent
+        if parent is not None and stored.get(parent) is parent:
+            children[parent] -= 1
+        children.pop(node, None)
+
+    def drop_dead_end(self, node, root, stored, children, backed_up, opened):
+        # Drops a closed state without stored children, backing an infinite f up into its parent so it is not regenerated.
+        # A closed parent left without children and without forgotten children to go back for is a dead end too.
+        # Returns True when the initial state is a dead end: no solution fits in the budget.
+        while node is not root:
+            parent = node.parent
+            self.unlink(node, stored, children)
+            del stored[node]
+            backed_up.pop(node, None)
+            self.forgotten += 1
+            if stored.get(parent) is not parent:
+                return False
+            backed_up.setdefault(parent, {})[node.action] = float('inf')
+            if children[parent] > 0 or parent in opened:
+                return False
+            node = parent
+        return True
+
+    def forget_worst(self, buckets, count, root, stored, children, backed_up, opened, min_f):
+        # Forgets up to count open leaves, taking the oldest (shallowest) entries of the highest f buckets first.
+        # Returns the new lowest bucket to pop from, as parents may go back on the open list below it.
+        f = len(buckets) - 1
+        while count > 0 and f >= 0:
+            bucket = buckets[f]
+            kept = []
+            while bucket and count > 0:
+                node = bucket.popleft()
+                if opened.get(node) != f or stored.get(node) is not node:
+                    continue # stale entry
+                if children[node] > 0 or node is root:
+                    kept.append(node) # re-opened parents still have stored children, they cannot go yet
+                    continue
+                self.unlink(node, stored, children)
+                del stored[node]
+                del opened[node]
+                backed_up.pop(node, None) # its own forgotten children are summed up by the f backed up below
+                self.forgotten += 1
+                count -= 1
+
+                # back the forgotten f up into the parent and put the parent back on the open list
+                parent = node.parent
+                if stored.get(parent) is not parent:
+                    continue # its parent was replaced by a better path
+                forgotten = backed_up.setdefault(parent, {})
+                lowest = min(forgotten.values(), default=float('inf'))
+                forgotten[node.action] = f
+                if f < lowest and opened.get(parent, float('inf')) > f:
+                    opened[parent] = f
+                    # back at the old end of this bucket with the kept entries, so the deeper states of the same f are
+                    # expanded before it again and this pass does not forget it
+                    kept.append(parent)
+                    if f < min_f:
+                        min_f = f
+            bucket.extendleft(reversed(kept))
+            f -= 1
+        return min_f
+
+    # Bidirectional BFS: searches forward from the initial state and backward from the goal state, always expanding a whole
+    # layer of the smaller side. Every state generated that the other side has already reached is a meeting point; once
+    # the layer is finished the best meeting point is optimal.
+    @cached(optimal=True)
+    def bidirectional_BFS_solve(self):
+        start = self.initial_state
+        goal = start.goal_state()
+
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("bidirectional BFS")
+        if not self.check_solvable():
+            return []
+
+        if start.goal_test():
+            self.timer = time.time() - self.timer
+            return []
+
+        # each side maps every state it has reached to the node holding its path
+        forward, backward = {start: start}, {goal: goal}
+        forward_layer, backward_layer = [start], [goal]
+
+        while forward_layer and backward_layer:
+            #termination condition: time limit exceeded or search abandoned
+            if time.time() - self.timer > self.time_limit:
+                print("BFS ERROR: Time limit exceeded.")
+                self.timer = None
+                return []
+            if self.should_stop is not None and self.should_stop():
+                return []
+
+            if len(forward_layer) <= len(backward_layer):
+                forward_layer, meet = self.expand_layer(forward_layer, forward, backward)
+                if meet:
+                    self.timer = time.time() - self.timer
+                    return self.stitch(meet[0], meet[1])
+            else:
+                backward_layer, meet = self.expand_layer(backward_layer, backward, forward)
+                if meet:
+                    self.timer = time.time() - self.timer
+                    return self.stitch(meet[1], meet[0])
+        return []
+
+    def expand_layer(self, layer, reached, other):
+        # Expands one BFS layer of a side, returns the next layer and the best (own node, other node) meeting pair
+        next_layer = []
+        meet = None
+        for state in layer:
+            self.visit_counter += 1
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(layer) + len(next_layer))
+
+            for new_state in state.generate_legal_successors():
+                self.generated += 1
+                if new_state in reached:
+                    self.duplicates += 1
+                    continue
+                reached[new_state] = new_state
+                next_layer.append(new_state)
+                if new_state in other:
+                    node = other[new_state]
+                    if meet is None or node.path_cost < meet[1].path_cost:
+                        meet = (new_state, node)
+        return next_layer, meet
+
+    def stitch(self, forward_node, backward_node):
+        # Joins a forward path to the initial state and a backward path to the goal that end in the same state
+        sequence = []
+        state = forward_node
+        while state.parent is not None:
+            sequence.append(state.action)
+            state = state.parent
+        sequence.reverse()
+        # the backward path was built by moving away from the goal, so it is walked back with inverted moves
+        state = backward_node
+        while state.parent is not None:
+            sequence.append(state.inverse_action(state.action))
+            state = state.parent
         return sequence
 
+    # Bidirectional heuristic search (MM, Holte et al. 2016): both sides expand the node with the smallest priority
+    # max(g + h, 2g), with the state's heuristic forward and its Manhattan distance to the initial state backward.
+    # The search stops once the best path found through a meeting state is no longer than the smallest priority left,
+    # which makes the result optimal, and the two searches are guaranteed to meet in the middle.
+    @cached(optimal=True)
+    def bidirectional_A_star_solve(self):
+        start = self.initial_state
+        goal = start.goal_state()
+
+        self.visit_counter = 0
+        self.timer = time.time()
+        self.start_metrics("bidirectional A*")
+        if not self.check_solvable():
+            return []
+
+        if start.goal_test():
+            self.timer = time.time() - self.timer
+            return []
+
+        sides = [
+            {"reached": {start: start}, "closed": set(), "open": [], "h": lambda state: state.heuristic},
+            {"reached": {goal: goal}, "closed": set(), "open": [], "h": lambda state: state.distance_to(start)},
+        ]
+        counter = 0 # tie breaker so states are never compared in the heaps
+        for side, node in zip(sides, (start, goal)):
+            heapq.heappush(side["open"], (max(side["h"](node), 0), counter, node))
+            counter += 1
+
+        best = float('inf')
+        meet = None
+        while sides[0]["open"] and sides[1]["open"]:
+            # drop stale heap entries so the tops are live open nodes
+            for side in sides:
+                heap = side["open"]
+                while heap and (heap[0][2] in side["closed"] or side["reached"].get(heap[0][2]) is not heap[0][2]):
+                    heapq.heappop(heap)
+            if not sides[0]["open"] or not sides[1]["open"]:
+                break
+
+            lower = min(sides[0]["open"][0][0], sides[1]["open"][0][0])
+            if best <= lower:
+                break
+
+            #termination condition: time limit exceeded or search abandoned
+            if time.time() - self.timer > self.time_limit:
+                print("A* ERROR: Time limit exceeded.")
+                self.timer = None
+                return []
+            if self.should_stop is not None and self.should_stop():
+                return []
+
+            direction = 0 if sides[0]["open"][0][0] <= sides[1]["open"][0][0] else 1
+            side, other = sides[direction], sides[1 - direction]
+            _, _, state = heapq.heappop(side["open"])
+            side["closed"].add(state)
+            self.visit_counter += 1
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(sides[0]["open"]) + len(sides[1]["open"]))
+
+            for new_state in state.generate_legal_successors():
+                self.generated += 1
+                old = side["reached"].get(new_state)
+                if old is not None and old.path_cost <= new_state.path_cost:
+                    self.duplicates += 1
+                    continue
+                side["reached"][new_state] = new_state
+                side["closed"].discard(new_state)
+                g = new_state.path_cost
+                heapq.heappush(side["open"], (max(g + side["h"](new_state), 2 * g), counter, new_state))
+                counter += 1
+
+                node = other["reached"].get(new_state)
+                if node is not None and g + node.path_cost < best:
+                    best = g + node.path_cost
+                    meet = (new_state, node) if direction == 0 else (node, new_state)
+
+        if meet is None:
+            return []
+        self.timer = time.time() - self.timer
+        return self.stitch(meet[0], meet[1])
+
     # IDA* implementation using psuedocode from https://en.wikipedia.org/wiki/Iterative_deepening_A*
+    @cached(optimal=True)
     def IDA_star_solve(self):
         
         bound = self.initial_state.heuristic
@@ -128,6 +1136,9 @@ class TreeSearch:
         self.timer = time.time()
         self.visit_counter = 0
         self.bound = 0
+        self.start_metrics("IDA*")
+        if not self.check_solvable():
+            return []
 
         while True:
             t = self.search(self.initial_state, self.bound, sequence)
@@ -135,13 +1146,14 @@ class TreeSearch:
                 sequence.reverse()
                 return sequence
             
-            #termination condition: time limit exceeded
-            if t == "ERROR":
+            #termination condition: time limit exceeded or search abandoned
+            if t == "ERROR" or t == "STOPPED":
                 return sequence
             
             if t == float('inf'):
                 return []
             self.bound = t
+            self.fire("iteration")
 
     def search(self, state, bound, sequence):
         f = state.eval
@@ -154,25 +1166,25 @@ class TreeSearch:
         
         min = float('inf')
 
-        #termination condition: time limit exceeded
-        if (time.time() - self.timer) // 1 > TIME_LIMIT: # 5 minute time limit
+        #termination condition: time limit exceeded or search abandoned
+        if time.time() - self.timer > self.time_limit:
             print("IDA* ERROR: Time limit exceeded.")
             self.timer = None
             return "ERROR"
+        if self.should_stop is not None and self.should_stop():
+            return "STOPPED"
 
         self.visit_counter += 1
-        '''
-        clear_console()
-        print("IDA* solving...")
-        print("Visited: ", self.visit_counter)
-        print("Time final: ", (time.time() - self.timer) // 1, " seconds")
-        print("Visited/Time: ", self.visit_counter / (time.time() - self.timer))
-        print("Bound: ", bound)
-        '''
+
+        # progress reporting, see console_progress for the console output
+        if self.visit_counter >= self.next_check:
+            self.instrument(state, state.path_cost)
+
         for new_state in state.generate_legal_successors():
+            self.generated += 1
             t = self.search(new_state, bound, sequence)
-            if t == "ERROR":
-                return "ERROR"
+            if t == "ERROR" or t == "STOPPED":
+                return t
             if t == "FOUND":
                 sequence.append(new_state.action)
                 return "FOUND"
@@ -180,3 +1192,423 @@ class TreeSearch:
                 min = t
         return min
 
+
+    # IDA* on a single board mutated in place: moves are applied and undone with perform_action, the path is kept on a stack
+    # and the move undoing the previous one is never tried. No State objects are created during the search.
+    # The iterative version keeps its own stack of remaining moves per depth so deep 5x5 searches cannot hit the recursion limit.
+    # table (a TranspositionTable, or its number of entries) lets the search skip transpositions and subtrees already
+    # proven to exceed the bound, its hit rate is reported by stats().
+    @cached(optimal=True)
+    def IDA_star_inplace_solve(self, recursive=False, table=None):
+        state = self.initial_state.copy()
+        path = [] #sequence of actions, doubles as the DFS stack
+
+        # reset relevant metric variables
+        self.timer = time.time()
+        self.visit_counter = 0
+        self.bound = state.heuristic
+        self.table = TranspositionTable(table) if isinstance(table, int) else table
+        if self.table is not None:
+            self.table.clear() # entries hold path costs from the previous board's start
+        self.start_metrics("IDA* in place")
+        if not self.check_solvable():
+            return []
+
+        while True:
+            if self.table is not None:
+                t = self.inplace_table_search(state, path, self.table)
+            elif recursive:
+                t = self.inplace_search(state, 0, path, None)
+            else:
+                t = self.inplace_iterative_search(state, path)
+            if t == "FOUND":
+                self.timer = time.time() - self.timer
+                return path
+
+            #termination condition: time limit exceeded or search abandoned
+            if t == "ERROR" or t == "STOPPED":
+                return []
+
+            if t == float('inf'):
+                return []
+            self.bound = t
+            self.fire("iteration")
+
+    def inplace_search(self, state, g, path, undo):
+        f = g + state.heuristic
+        if f > self.bound:
+            return f
+
+        if state.goal_test():
+            return "FOUND"
+
+        #termination condition: time limit exceeded or search abandoned
+        stop = self.check_limits()
+        if stop:
+            return stop
+
+        self.visit_counter += 1
+
+        # progress reporting, see console_progress for the console output
+        if self.visit_counter >= self.next_check:
+            self.instrument(state, g)
+
+        min = float('inf')
+        for move in state.legal_actions():
+            if move == undo:
+                continue
+            self.generated += 1
+            state.perform_action(move)
+            path.append(move)
+            t = self.inplace_search(state, g + 1, path, state.inverse_action(move))
+            if isinstance(t, str): # FOUND, ERROR or STOPPED
+                return t
+            path.pop()
+            state.perform_action(state.inverse_action(move))
+            if t < min:
+                min = t
+        return min
+
+    # The search starts below the moves already in path (the parallel solver hands out subtrees this way)
+    def inplace_iterative_search(self, state, path):
+        bound = self.bound
+        f = len(path) + state.heuristic
+        if f > bound:
+            return f
+        if state.goal_test():
+            return "FOUND"
+
+        min = float('inf')
+        self.visit_counter += 1
+        # stack[d] holds the moves still to try at depth d below the root, path[root + d] is the move applied at depth d
+        undo = state.inverse_action(path[-1]) if path else None
+        stack = [[m for m in state.legal_actions()[::-1] if m != undo]]
+        while stack:
+            moves = stack[-1]
+            if not moves:
+                # every move at this depth is done, backtrack
+                stack.pop()
+                if stack:
+                    state.perform_action(state.inverse_action(path.pop()))
+                continue
+
+            move = moves.pop()
+            self.generated += 1
+            state.perform_action(move)
+            path.append(move)
+            f = len(path) + state.heuristic
+            if f > bound:
+                if f < min:
+                    min = f
+                path.pop()
+                state.perform_action(state.inverse_action(move))
+                continue
+
+            if state.goal_test():
+                return "FOUND"
+
+            #termination condition: time limit exceeded or search abandoned
+            stop = self.check_limits()
+            if stop:
+                return stop
+
+            self.visit_counter += 1
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(path))
+
+            undo = state.inverse_action(move)
+            stack.append([m for m in state.legal_actions()[::-1] if m != undo])
+        return min
+
+    # inplace_iterative_search with a transposition table: every depth also keeps its state's key and the smallest f that
+    # exceeded the bound below it, which is stored in the table once the state's subtree is done
+    def inplace_table_search(self, state, path, table):
+        bound = self.bound
+        root = len(path)
+        f = root + state.heuristic
+        if f > bound:
+            return f
+        if state.goal_test():
+            return "FOUND"
+
+        self.visit_counter += 1
+        undo = state.inverse_action(path[-1]) if path else None
+        # frame: [moves still to try, key, move excluded as the undo, smallest f above the bound found below]
+        stack = [[[m for m in state.legal_actions()[::-1] if m != undo], state.key(), undo, float('inf')]]
+        while True:
+            frame = stack[-1]
+            moves = frame[0]
+            if not moves:
+                # the whole subtree is done without finding the goal, remember how far above the bound it is
+                stack.pop()
+                table.store(frame[1], root + len(stack), frame[2], frame[3], bound)
+                if not stack:
+                    return frame[3]
+                state.perform_action(state.inverse_action(path.pop()))
+                if frame[3] < stack[-1][3]:
+                    stack[-1][3] = frame[3]
+                continue
+
+            move = moves.pop()
+            self.generated += 1
+            state.perform_action(move)
+            path.append(move)
+            f = len(path) + state.heuristic
+            if f > bound:
+                if f < frame[3]:
+                    frame[3] = f
+                path.pop()
+                state.perform_action(state.inverse_action(move))
+                continue
+
+            if state.goal_test():
+                return "FOUND"
+
+            #termination condition: time limit exceeded or search abandoned
+            stop = self.check_limits()
+            if stop:
+                return stop
+
+            undo = state.inverse_action(move)
+            key = state.key()
+            t = table.lookup(key, len(path), undo, bound)
+            if t is not None:
+                self.duplicates += 1
+                if t < frame[3]:
+                    frame[3] = t
+                path.pop()
+                state.perform_action(undo)
+                continue
+
+            self.visit_counter += 1
+
+            # progress reporting, see console_progress for the console output
+            if self.visit_counter >= self.next_check:
+                self.instrument(state, len(path))
+
+            stack.append([[m for m in state.legal_actions()[::-1] if m != undo], key, undo, float('inf')])
+
+    def check_limits(self):
+        # Checking the clock on every node is expensive, so limits are only checked every 1024 expansions
+        if self.visit_counter & 1023 != 0:
+            return None
+        if time.time() - self.timer > self.time_limit:
+            print("IDA* ERROR: Time limit exceeded.")
+            self.timer = None
+            return "ERROR"
+        if self.should_stop is not None and self.should_stop():
+            return "STOPPED"
+        return None
+
+    # Parallel IDA*: the tree is expanded to split_depth moves and each threshold iteration hands the resulting subtrees to
+    # a process pool. Subtrees are numbered in the order the serial search visits them; a worker that finds the goal
+    # publishes its number and workers on later subtrees give up, so the returned sequence is the one IDA_star_inplace_solve
+    # finds. Workers also share the smallest f that exceeded the bound, which becomes the next bound.
+    @cached(optimal=True)
+    def IDA_star_parallel_solve(self, processes=None, split_depth=4):
+        # the process pool machinery is only loaded when a parallel search runs
+        import multiprocessing
+
+        root = self.initial_state
+
+        # reset relevant metric variables
+        self.timer = time.time()
+        self.visit_counter = 0
+        self.bound = root.heuristic
+        self.worker_counters = {}
+        self.start_metrics("IDA* parallel")
+        if not self.check_solvable():
+            return []
+
+        if root.goal_test():
+            self.timer = time.time() - self.timer
+            return []
+
+        frontier = self.split_frontier(root.copy(), [], split_depth, [])
+        found_index = multiprocessing.Value('l', len(frontier))
+        next_bound = multiprocessing.Value('d', float('inf'))
+
+        with multiprocessing.Pool(processes, initializer=_init_parallel_worker, initargs=(root, found_index, next_bound, self.time_limit)) as pool:
+            while True:
+                found_index.value = len(frontier)
+                next_bound.value = float('inf')
+                tasks = [(index, prefix, self.bound, self.timer) for index, prefix in enumerate(frontier)]
+                best = None
+                for index, pid, nodes, t, path in pool.imap_unordered(_search_subtree, tasks):
+                    self.visit_counter += nodes
+                    self.worker_counters[pid] = self.worker_counters.get(pid, 0) + nodes
+
+                    #termination condition: time limit exceeded
+                    if t == "ERROR":
+                        print("IDA* ERROR: Time limit exceeded.")
+                        pool.terminate()
+                        self.timer = None
+                        return []
+                    if t == "FOUND" and (best is None or index < best[0]):
+                        best = (index, path)
+
+                if best is not None:
+                    self.timer = time.time() - self.timer
+                    return best[1]
+                if next_bound.value == float('inf'):
+                    return []
+                self.bound = int(next_bound.value)
+                self.fire("iteration")
+
+    def split_frontier(self, state, path, depth, frontier):
+        # Move sequences of length depth (without immediate undos) in the order the serial search would try them
+        undo = state.inverse_action(path[-1]) if path else None
+        moves = [m for m in state.legal_actions() if m != undo]
+        if len(path) == depth or not moves:
+            frontier.append(path.copy())
+            return frontier
+        for move in moves:
+            state.perform_action(move)
+            path.append(move)
+            self.split_frontier(state, path, depth, frontier)
+            path.pop()
+            state.perform_action(state.inverse_action(move))
+        return frontier
+
+
+def console_progress(event, stats):
+    # Hook printing live progress to the console, e.g. TreeSearch(board, hooks=[console_progress])
+    clear_console()
+    print(stats["algorithm"], "solving...", "(new bound)" if event == "iteration" else "")
+    print("Visited: ", stats["expanded"])
+    print("Generated: ", stats["generated"], " Duplicates: ", stats["duplicates"])
+    print("Frontier: ", stats["frontier"])
+    print("Time: ", stats["elapsed"] // 1, " seconds")
+    print("Visited/Time: ", stats["nodes_per_sec"] // 1)
+    print("Bound: ", stats["bound"])
+    histogram = stats["heuristic_histogram"]
+    if histogram:
+        samples = sum(histogram.values())
+        print("Avg heuristic: ", sum(h * count for h, count in histogram.items()) / samples)
+        print("Min heuristic: ", min(histogram))
+        print("Max heuristic: ", max(histogram))
+    if stats["table"]:
+        print("Table hit rate: ", round(stats["table"]["hit_rate"], 3), " Filled: ", stats["table"]["filled"], "/", stats["table"]["size"])
+
+
+class BackgroundSolver:
+    '''
+    Runs a TreeSearch solver on a daemon thread so an interactive front end keeps drawing frames while it searches:
+        solver = BackgroundSolver(TreeSearch(board.copy()), "IDA_star_inplace_solve")
+        solver.start()
+        ...every frame: solver.progress(), and solver.result once solver.done()
+        solver.cancel() # e.g. when the board is reshuffled
+    Cancelling goes through TreeSearch.should_stop, which the solvers check periodically, so the thread stops soon after
+    without waiting for the time limit. The search owns its initial state: pass a copy of a board that is still on screen.
+
+    Required arguments:
+    - search: the TreeSearch object to run
+    - method: name of the solver method, e.g. "A_star_solve" or SOLVERS["ida"]
+    Optional
+    - keyword arguments passed on to the solver method
+
+    attributes:
+    - result: the move sequence once the solver returned, None before (an empty list when it failed or was cancelled)
+    - error: the exception the solver raised, if any
+    - cancelled: True once cancel() was called
+
+    methods:
+    - start: starts the search
+    - cancel: asks the search to stop, without waiting for it
+    - done: True once the thread finished
+    - progress: nodes expanded, current bound and seconds elapsed, cheap enough to read every frame
+    '''
+    def __init__(self, search, method, **kwargs):
+        self.search = search
+        self.method = method
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.stop_event = threading.Event()
+        search.should_stop = self.stop_event.is_set
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            self.result = getattr(self.search, self.method)(**self.kwargs)
+        except Exception as e:
+            self.error = e
+            self.result = []
+
+    def start(self):
+        self.started = time.time()
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+        self.stop_event.set()
+
+    def done(self):
+        return not self.thread.is_alive() and self.result is not None
+
+    def progress(self):
+        # plain attribute reads: stats() would copy dictionaries the search thread is still changing
+        return {
+            "algorithm": self.search.algorithm,
+            "expanded": self.search.visit_counter,
+            "bound": self.search.bound,
+            "elapsed": time.time() - self.started,
+        }
+
+
+# Per process state of the parallel IDA* workers, set up once by the pool initializer
+_worker = {}
+
+def _init_parallel_worker(initial_state, found_index, next_bound, time_limit):
+    _worker["search"] = TreeSearch(initial_state, time_limit=time_limit)
+    _worker["found_index"] = found_index
+    _worker["next_bound"] = next_bound
+
+def _search_subtree(task):
+    # Runs one bounded DFS below a frontier prefix, returns (index, pid, nodes expanded, result, path)
+    index, prefix, bound, timer = task
+    ts = _worker["search"]
+    found_index = _worker["found_index"]
+    next_bound = _worker["next_bound"]
+    pid = os.getpid()
+
+    # an earlier subtree already holds the solution
+    if found_index.value < index:
+        return index, pid, 0, "STOPPED", None
+
+    ts.timer = timer
+    ts.bound = bound
+    ts.visit_counter = 0
+    ts.should_stop = lambda: found_index.value < index
+
+    # replay the prefix, checking the nodes on it as the serial search would
+    state = ts.initial_state.copy()
+    path = []
+    t = None
+    for move in prefix:
+        state.perform_action(move)
+        path.append(move)
+        f = len(path) + state.heuristic
+        if f > bound:
+            t = f
+            break
+        if state.goal_test():
+            t = "FOUND"
+            break
+    if t is None:
+        t = ts.inplace_iterative_search(state, path)
+
+    if t == "FOUND":
+        with found_index.get_lock():
+            if index < found_index.value:
+                found_index.value = index
+        return index, pid, ts.visit_counter, t, path
+    if not isinstance(t, str):
+        with next_bound.get_lock():
+            if t < next_bound.value:
+                next_bound.value = t
+    return index, pid, ts.visit_counter, t, None